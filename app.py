@@ -1,36 +1,139 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, Blueprint, current_app, g, render_template, request, redirect, url_for, flash, send_file
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, or_, and_, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager, selectinload, object_session
+from sqlalchemy.exc import OperationalError
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+from werkzeug.local import LocalProxy
 import os
-from datetime import datetime
-import tempfile
-from pdf_generator import generate_bulletin_pdf
+from datetime import datetime, timedelta
+import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import namedtuple
+from bulletin_cache import BulletinCache
+from user_cache import CachedUser, UserCache
+from migrations import upgrade_database, explain_query_plan
+from storage import DEFAULT_STORAGE_MODE, configure_storage, install_storage_pragmas, get_storage_mode, read_storage_pragmas
+from grade_import import read_grade_rows, parse_grade_number, GradeImportError
+from seeding import generate_school, class_username_prefix
+from metrics import install_metrics, pdf_render_timer
+from profiling import install_profiler
+from grading import (DEFAULT_SUBJECTS_PART1, DEFAULT_SUBJECTS_PART2, subject_average, weighted_average,
+                     get_appreciation_for_average, get_subject_appreciation, make_bulletin_row, split_grades_for_bulletin,
+                     compute_bulletin_totals)
 import logging
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key')  # Change this in production
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///school.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+import click
+import random
+import time
+import pstats
+import hashlib
+
+# The app is built by create_app() (at the end of this module); `flask` finds it automatically. Routes and
+# CLI commands are registered on the `main` blueprint, the extensions and caches are bound to the app there.
+db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# Helper function to determine appreciation based on subject average
-def get_subject_appreciation(moy_cl, n_compo):
-    if moy_cl is None or n_compo is None: # Handle cases where grades might be missing
-        return "N/A"
-    mg = (float(moy_cl) + 2 * float(n_compo)) / 3.0
-    if mg >= 16: return "Très Bien"
-    if mg >= 14: return "Bien"
-    if mg >= 12: return "Assez Bien"
-    if mg >= 10: return "Passable"
-    if mg >= 8: return "Insuffisant"
-    return "Faible"
+bp = Blueprint('main', __name__, cli_group=None) # Commands stay top-level: `flask upgrade-db`
+
+# Per-app objects created by create_app(), used like module globals
+bulletin_cache = LocalProxy(lambda: current_app.extensions['bulletin_cache'])
+user_cache = LocalProxy(lambda: current_app.extensions['user_cache'])
+bulletin_job_executor = LocalProxy(lambda: current_app.extensions['bulletin_job_executor'])
+
+# Helper functions to keep GradeSummary rows in sync with the Grade table.
+# Grades are assigned to part 1 or 2 by their subject key (see grade_subject_key).
+def _part1_subject_keys(school_class_id):
+    return {key for key, _name in get_bulletin_subjects(school_class_id)[0]}
+
+def _summary_part1_subjects(student_id):
+    student = db.session.get(User, int(student_id))
+    return _part1_subject_keys(student.current_class_id if student else None)
+
+def apply_grade_to_summary(student_id, period, subject_key, moy_cl, n_compo, coef, sign=1, part1_subjects=None):
+    # sign=1 adds the grade to the student's period totals, sign=-1 removes it.
+    # Changes are only added to the session, the caller commits them with the grade itself.
+    student_id = int(student_id)
+    summary = GradeSummary.query.filter_by(student_id=student_id, period=period).first()
+    if not summary:
+        summary = GradeSummary(student_id=student_id, period=period, grade_count=0, total_coef=0, total_moy_coef=0.0,
+                               part1_coef=0, part1_moy_coef=0.0, part2_coef=0, part2_moy_coef=0.0)
+        db.session.add(summary)
+    if part1_subjects is None:
+        part1_subjects = _summary_part1_subjects(student_id)
+
+    moy_coef = subject_average(moy_cl, n_compo) * coef
+    summary.grade_count += sign
+    summary.total_coef += sign * coef
+    summary.total_moy_coef += sign * moy_coef
+    if subject_key in part1_subjects:
+        summary.part1_coef += sign * coef
+        summary.part1_moy_coef += sign * moy_coef
+    else:
+        summary.part2_coef += sign * coef
+        summary.part2_moy_coef += sign * moy_coef
+    summary.average = (summary.total_moy_coef / summary.total_coef) if summary.total_coef > 0 else None
+    summary.updated_at = datetime.utcnow()
+
+    if summary.grade_count <= 0:
+        db.session.delete(summary)
+    return summary
+
+def rebuild_grade_summaries(school_class_id=None):
+    # Recompute GradeSummary rows from scratch (all students, or only those of one class)
+    students_query = User.query.filter_by(role='student')
+    if school_class_id is not None:
+        students_query = students_query.filter_by(current_class_id=school_class_id)
+    students = students_query.all()
+    student_ids = [student.id for student in students]
+
+    GradeSummary.query.filter(GradeSummary.student_id.in_(student_ids)).delete(synchronize_session=False)
+    db.session.flush()
+
+    part1_by_class = {}
+    part1_by_student = {}
+    for student in students:
+        if student.current_class_id not in part1_by_class:
+            part1_by_class[student.current_class_id] = _part1_subject_keys(student.current_class_id)
+        part1_by_student[student.id] = part1_by_class[student.current_class_id]
+
+    summaries = {}
+    for g in Grade.query.filter(Grade.student_id.in_(student_ids)).all():
+        key = (g.student_id, g.period)
+        if key not in summaries:
+            summaries[key] = GradeSummary(student_id=g.student_id, period=g.period, grade_count=0, total_coef=0, total_moy_coef=0.0,
+                                          part1_coef=0, part1_moy_coef=0.0, part2_coef=0, part2_moy_coef=0.0)
+        summary = summaries[key]
+        moy_coef = subject_average(g.moy_cl, g.n_compo) * g.coef
+        summary.grade_count += 1
+        summary.total_coef += g.coef
+        summary.total_moy_coef += moy_coef
+        if grade_subject_key(g) in part1_by_student[g.student_id]:
+            summary.part1_coef += g.coef
+            summary.part1_moy_coef += moy_coef
+        else:
+            summary.part2_coef += g.coef
+            summary.part2_moy_coef += moy_coef
+    for summary in summaries.values():
+        summary.average = (summary.total_moy_coef / summary.total_coef) if summary.total_coef > 0 else None
+        summary.updated_at = datetime.utcnow()
+    db.session.add_all(summaries.values())
+    return len(summaries)
+
+# Shared validation rules for grade values, returns an error message or None
+def validate_grade_values(moy_cl, n_compo, coef):
+    if not (0 <= moy_cl <= 20 and 0 <= n_compo <= 20):
+        return 'Grades must be between 0 and 20.'
+    if coef <= 0:
+        return 'Coefficient must be a positive number.'
+    return None
 
 # Models
 class User(UserMixin, db.Model):
+    __table_args__ = (db.Index('ix_user_class_role', 'current_class_id', 'role'),) # Keep in sync with migrations.py
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
@@ -39,6 +142,11 @@ class User(UserMixin, db.Model):
     current_class = db.relationship('SchoolClass', backref=db.backref('students', lazy='dynamic'))
     grades = db.relationship('Grade', backref='student', lazy=True)
 
+    # Same attribute as CachedUser (the current_user of authenticated requests, see load_user)
+    @property
+    def current_class_name(self):
+        return self.current_class.name if self.current_class else None
+
 class SchoolClass(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False) # e.g., "Terminale C", "Seconde A"
@@ -48,9 +156,17 @@ class SchoolClass(db.Model):
         return f'<SchoolClass {self.name}>'
 
 class Grade(db.Model):
+    __table_args__ = ( # Keep in sync with migrations.py
+        db.Index('ix_grade_student_period', 'student_id', 'period'),
+        db.Index('ix_grade_date_id', 'date', 'id'),
+        db.Index('ix_grade_subject_id', 'subject_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     subject = db.Column(db.String(80), nullable=False)
+    # Subject of the student's bulletin structure with this name, None if the class has no structure or
+    # the subject is not part of it. Kept in sync by link_grade_subjects() when the structure changes
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=True)
     moy_cl = db.Column(db.Float, nullable=False)  # Moyenne de classe/continue
     n_compo = db.Column(db.Float, nullable=False) # Note de composition
     coef = db.Column(db.Integer, nullable=False)   # Coefficient
@@ -62,23 +178,178 @@ class BulletinStructure(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     school_class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'), unique=True, nullable=False)
     school_class = db.relationship('SchoolClass', backref=db.backref('bulletin_structure', uselist=False, lazy=True))
-    # Store subject lists as comma-separated strings
+    # Subject lists as typed in the form, comma-separated. The parsed, ordered list is stored in Subject,
+    # always set both through set_structure_subjects()
     subjects_part1 = db.Column(db.Text, nullable=False) # e.g., "MATHS,PHYSIQUE,CHIMIE,GÉOLOGIE/BIO,PHILOSOPHIE,ANGLAIS"
     subjects_part2 = db.Column(db.Text, nullable=False) # e.g., "E.C.M,EPS,INFORMAT.,DESSIN TECH.,CONDUITE"
+    subjects = db.relationship('Subject', backref='bulletin_structure', lazy=True, cascade='all, delete-orphan',
+                               order_by='(Subject.part, Subject.position)')
     # Add other fields if needed, like bulletin_title_override, etc.
 
+class Subject(db.Model):
+    # One subject of a bulletin structure, in bulletin order (part 1 or 2, then position in the part)
+    __table_args__ = (db.UniqueConstraint('bulletin_structure_id', 'name'),)
+    id = db.Column(db.Integer, primary_key=True)
+    bulletin_structure_id = db.Column(db.Integer, db.ForeignKey('bulletin_structure.id'), nullable=False)
+    name = db.Column(db.String(80), nullable=False)
+    part = db.Column(db.Integer, nullable=False) # 1 or 2
+    position = db.Column(db.Integer, nullable=False)
+
+class GradeSummary(db.Model):
+    # Materialized totals of a student's grades for one period, maintained incrementally
+    # by add_grade/update_grade/delete_grade (see apply_grade_to_summary) and rebuilt
+    # from the Grade table with `flask rebuild-summaries`
+    __table_args__ = (db.UniqueConstraint('student_id', 'period'),)
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(100), nullable=False)
+    grade_count = db.Column(db.Integer, nullable=False, default=0)
+    total_coef = db.Column(db.Integer, nullable=False, default=0) # Σk
+    total_moy_coef = db.Column(db.Float, nullable=False, default=0.0) # Σ(m+2n)/3*k
+    part1_coef = db.Column(db.Integer, nullable=False, default=0)
+    part1_moy_coef = db.Column(db.Float, nullable=False, default=0.0)
+    part2_coef = db.Column(db.Integer, nullable=False, default=0)
+    part2_moy_coef = db.Column(db.Float, nullable=False, default=0.0)
+    average = db.Column(db.Float, nullable=True) # Σ(m+2n)/3*k / Σk, None when Σk is 0
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class CacheGeneration(db.Model):
+    # Generation of a process-level cache, bumped whenever one of the worker processes invalidates it
+    # (see publish_cache_invalidation)
+    name = db.Column(db.String(50), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+class BulletinJob(db.Model):
+    # A bulletin rendered in the background (see submit_bulletin_job). The PDF itself is stored in the
+    # bulletin cache under cache_key, the row only tracks the job's state for status polling.
+    __table_args__ = (db.Index('ix_bulletin_job_student_created', 'student_id', 'created_at'),)
+    id = db.Column(db.String(32), primary_key=True) # Random hex id, not guessable
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(100), nullable=False)
+    cache_key = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done or failed
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
 # Define standard periods
 STANDARD_PERIODS = ["1ère Période", "2e Période", "3e Période"]
 
+# Background bulletin jobs still queued/running after this long are reported as failed, finished ones are
+# deleted after BULLETIN_JOB_RETENTION
+BULLETIN_JOB_TIMEOUT = timedelta(minutes=10)
+BULLETIN_JOB_RETENTION = timedelta(days=1)
+
+# Number of grades per page in the teacher dashboard and /api/grades
+GRADES_PAGE_SIZE = 50
+
+# Keyset pagination cursors for grade listings: "<date isoformat>_<grade id>" of the last row of a page
+def encode_grade_cursor(grade):
+    return f"{grade.date.isoformat()}_{grade.id}"
+
+def decode_grade_cursor(cursor):
+    try:
+        date_str, grade_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_str), int(grade_id)
+    except (AttributeError, ValueError):
+        return None
+
+# Returns one page of grades (newest first) matching the filters, and the cursor of the next page (or None).
+# school_class_id/period/subject are optional filters, cursor comes from a previous page.
+def query_grades_page(school_class_id=None, period=None, subject=None, cursor=None, limit=GRADES_PAGE_SIZE):
+    grades_query = Grade.query.join(User, Grade.student_id == User.id).options(contains_eager(Grade.student))
+    if school_class_id is not None:
+        grades_query = grades_query.filter(User.current_class_id == school_class_id)
+    if period:
+        grades_query = grades_query.filter(Grade.period == period)
+    if subject:
+        # A subject of the class's structure is matched on its id (indexed), any other on its name
+        subject_id = get_subject_id(school_class_id, subject)
+        grades_query = grades_query.filter(Grade.subject_id == subject_id if subject_id is not None else Grade.subject == subject)
+
+    position = decode_grade_cursor(cursor) if cursor else None
+    if position:
+        last_date, last_id = position
+        grades_query = grades_query.filter(or_(
+            Grade.date < last_date,
+            and_(Grade.date == last_date, Grade.id < last_id)
+        ))
+
+    grades = grades_query.order_by(Grade.date.desc(), Grade.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_grade_cursor(grades[limit - 1]) if len(grades) > limit else None
+    return grades[:limit], next_cursor
+
+def grade_to_dict(grade):
+    return {
+        'id': grade.id,
+        'student_id': grade.student_id,
+        'student': grade.student.username,
+        'subject': grade.subject,
+        'period': grade.period,
+        'moy_cl': grade.moy_cl,
+        'n_compo': grade.n_compo,
+        'coef': grade.coef,
+        'appreciation': grade.appreciation,
+        'date': grade.date.strftime('%Y-%m-%d')
+    }
+
+# The logged-in user is loaded from the user cache: requests that only need the identity, role or class
+# of current_user run no query for it. Routes that modify a user load the User row itself.
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
-
-@app.route('/')
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.query(User.id, User.username, User.role, User.current_class_id, SchoolClass.name).outerjoin(
+            SchoolClass, User.current_class_id == SchoolClass.id
+        ).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = user_cache.put(CachedUser(*row))
+    return user
+
+# Cached users are dropped as soon as their row (or their class's name) changes in this process, and again
+# after the commit, so that a request reading the old row in the meantime cannot keep it cached.
+# Bulk query.update()/delete() bypass these events: call user_cache.invalidate/clear after them.
+def _mark_users_changed(session, user_id=None):
+    # user_id None: every user (a class was renamed)
+    if user_id is None:
+        user_cache.clear()
+        session.info['changed_user_ids'] = None
+    else:
+        user_cache.invalidate(user_id)
+        changed_user_ids = session.info.setdefault('changed_user_ids', set())
+        if changed_user_ids is not None:
+            changed_user_ids.add(user_id)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(_mapper, _connection, user):
+    _mark_users_changed(object_session(user), user.id)
+
+@event.listens_for(SchoolClass, 'after_update')
+def _invalidate_cached_class_users(_mapper, _connection, school_class):
+    _mark_users_changed(object_session(school_class))
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_users(session):
+    if 'changed_user_ids' not in session.info:
+        return
+    changed_user_ids = session.info.pop('changed_user_ids')
+    if changed_user_ids is None:
+        user_cache.clear()
+    for user_id in changed_user_ids or ():
+        user_cache.invalidate(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+@bp.route('/')
 def index():
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         # Handle both JSON and form data
@@ -160,13 +431,13 @@ def register():
             }, 201
 
         flash('Registration successful! Please login.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     # For GET request
     all_school_classes = SchoolClass.query.order_by(SchoolClass.name).all()
     return render_template('register.html', school_classes=all_school_classes)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -177,27 +448,30 @@ def login():
             login_user(user)
             flash('Login successful!', 'success')
             if user.role == 'teacher':
-                return redirect(url_for('teacher_interface'))
+                return redirect(url_for('main.teacher_interface'))
             else:
-                return redirect(url_for('student_interface'))
+                return redirect(url_for('main.student_interface'))
         flash('Invalid username or password', 'danger')
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/teacher')
+@bp.route('/teacher')
 @login_required
 def teacher_interface():
     if current_user.role != 'teacher':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    # Get selected class from request args, if any
+    # Get selected class and grade filters from request args, if any
     selected_class_name = request.args.get('class_name')
+    selected_period = request.args.get('period') or None
+    selected_subject = request.args.get('subject') or None
+    cursor = request.args.get('cursor') or None
 
     # Get all defined bulletin structures/classes for the dropdown
     all_school_classes_with_structure = SchoolClass.query.join(BulletinStructure).order_by(SchoolClass.name).all()
@@ -216,28 +490,56 @@ def teacher_interface():
     
     students = students_query.order_by(User.username).all()
     
-    # Grades could also be filtered by selected class if desired, but not essential for this step
-    grades = Grade.query.order_by(Grade.date.desc()).all()
+    # Only one page of the selected class's grades is rendered, the next pages are loaded from /api/grades
+    if selected_class_name and target_class_id is None:
+        grades, next_cursor = [], None
+    else:
+        grades, next_cursor = query_grades_page(target_class_id, selected_period, selected_subject, cursor)
     
     subjects_for_selected_class = []
-    if selected_class_name:
-        structure = BulletinStructure.query.join(SchoolClass).filter(SchoolClass.name == selected_class_name).first()
-        if structure:
-            subjects_part1 = [s.strip() for s in structure.subjects_part1.split(',') if s.strip()]
-            subjects_part2 = [s.strip() for s in structure.subjects_part2.split(',') if s.strip()]
-            subjects_for_selected_class = sorted(list(set(subjects_part1 + subjects_part2))) # Unique, sorted
+    structure = get_parsed_structure(target_class_id)
+    if structure:
+        subjects_for_selected_class = sorted(set(structure.subjects_part1 + structure.subjects_part2)) # Unique, sorted
 
     return render_template(
         'teacher.html', 
         students=students, 
         grades=grades, 
         defined_classes=class_names_for_dropdown,
+        bulletin_classes=all_school_classes_with_structure,
         selected_class_name=selected_class_name,
+        selected_period=selected_period,
+        selected_subject=selected_subject,
+        next_cursor=next_cursor,
         subjects_for_selected_class=subjects_for_selected_class,
         standard_periods=STANDARD_PERIODS
     )
 
-@app.route('/add_grade', methods=['POST'])
+@bp.route('/api/grades')
+@login_required
+def api_grades():
+    if current_user.role != 'teacher':
+        return {'error': 'Access denied'}, 403
+
+    school_class_id = None
+    class_name = request.args.get('class_name')
+    if class_name:
+        school_class_obj = SchoolClass.query.filter_by(name=class_name).first()
+        if not school_class_obj:
+            return {'grades': [], 'next_cursor': None}, 200
+        school_class_id = school_class_obj.id
+
+    limit = min(request.args.get('limit', GRADES_PAGE_SIZE, type=int), 500)
+    grades, next_cursor = query_grades_page(
+        school_class_id,
+        request.args.get('period') or None,
+        request.args.get('subject') or None,
+        request.args.get('cursor') or None,
+        max(limit, 1)
+    )
+    return {'grades': [grade_to_dict(g) for g in grades], 'next_cursor': next_cursor}, 200
+
+@bp.route('/add_grade', methods=['POST'])
 @login_required
 def add_grade():
     if current_user.role != 'teacher':
@@ -256,9 +558,9 @@ def add_grade():
             flash('Please specify the subject name when selecting \"Other\".', 'warning')
             # We also need to pass back the class filter to the redirect
             selected_class_for_grade = request.form.get('selected_class_for_grade')
-            redirect_url = url_for('teacher_interface')
+            redirect_url = url_for('main.teacher_interface')
             if selected_class_for_grade:
-                redirect_url = url_for('teacher_interface', class_name=selected_class_for_grade)
+                redirect_url = url_for('main.teacher_interface', class_name=selected_class_for_grade)
             return redirect(redirect_url)
 
     try:
@@ -272,9 +574,9 @@ def add_grade():
     except ValueError:
         flash('Invalid number format for grades or coefficient.', 'danger')
         selected_class_for_grade = request.form.get('selected_class_for_grade')
-        redirect_url = url_for('teacher_interface')
+        redirect_url = url_for('main.teacher_interface')
         if selected_class_for_grade:
-            redirect_url = url_for('teacher_interface', class_name=selected_class_for_grade)
+            redirect_url = url_for('main.teacher_interface', class_name=selected_class_for_grade)
         return redirect(redirect_url)
         
     # Determine the period
@@ -284,24 +586,23 @@ def add_grade():
     if not all([student_id, subject, moy_cl_str, n_compo_str, coef_str, period]) or (subject == 'Other' and not request.form.get('other_subject_name','').strip()):
         flash('All fields (Student, Subject, Period, Moy.CL, N.Compo, Coef) are required. If "Other" subject, ensure it is specified.', 'danger')
         selected_class_for_grade = request.form.get('selected_class_for_grade')
-        redirect_url = url_for('teacher_interface')
+        redirect_url = url_for('main.teacher_interface')
         if selected_class_for_grade:
-            redirect_url = url_for('teacher_interface', class_name=selected_class_for_grade)
+            redirect_url = url_for('main.teacher_interface', class_name=selected_class_for_grade)
         return redirect(redirect_url)
     
-    # Add validation for grade ranges if necessary (e.g., 0-20)
-    if not (0 <= moy_cl <= 20 and 0 <= n_compo <= 20):
-        flash('Grades must be between 0 and 20.', 'danger')
-        return redirect(url_for('teacher_interface'))
-    if coef <= 0:
-        flash('Coefficient must be a positive number.', 'danger')
-        return redirect(url_for('teacher_interface'))
+    validation_error = validate_grade_values(moy_cl, n_compo, coef)
+    if validation_error:
+        flash(validation_error, 'danger')
+        return redirect(url_for('main.teacher_interface'))
     
     subject_appreciation = get_subject_appreciation(moy_cl, n_compo)
 
+    student = db.session.get(User, int(student_id))
     grade = Grade(
         student_id=student_id,
         subject=subject,
+        subject_id=get_subject_id(student.current_class_id if student else None, subject),
         moy_cl=moy_cl,
         n_compo=n_compo,
         coef=coef,
@@ -310,11 +611,44 @@ def add_grade():
         date=datetime.utcnow()
     )
     db.session.add(grade)
+    apply_grade_to_summary(student_id, period, grade_subject_key(grade), moy_cl, n_compo, coef)
     db.session.commit()
+    invalidate_student_caches(student_id)
     flash('Grade added successfully', 'success')
-    return redirect(url_for('teacher_interface'))
+    return redirect(url_for('main.teacher_interface'))
+
+# Parse and validate the values of a grade from a JSON payload. When updating an existing grade,
+# missing fields keep their current value. Returns (values, None) or (None, error message).
+def parse_grade_update(data, grade=None):
+    try:
+        moy_cl = float(data.get('moy_cl', grade.moy_cl if grade else None))
+        n_compo = float(data.get('n_compo', grade.n_compo if grade else None))
+        coef = int(data.get('coef', grade.coef if grade else None))
+    except (ValueError, TypeError):
+        return None, 'Invalid number format for grades or coefficient.'
+
+    period = data.get('period', grade.period if grade else None) # Get period for update
+    if not period:
+        return None, 'Period is required.'
+
+    validation_error = validate_grade_values(moy_cl, n_compo, coef)
+    if validation_error:
+        return None, validation_error
+    return {'moy_cl': moy_cl, 'n_compo': n_compo, 'coef': coef, 'period': period}, None
+
+def apply_grade_update(grade, moy_cl, n_compo, coef, period, part1_subjects=None):
+    # Move the grade's contribution in the summary from its old values to the new ones
+    apply_grade_to_summary(grade.student_id, grade.period, grade_subject_key(grade), grade.moy_cl, grade.n_compo, grade.coef, sign=-1, part1_subjects=part1_subjects)
+    apply_grade_to_summary(grade.student_id, period, grade_subject_key(grade), moy_cl, n_compo, coef, part1_subjects=part1_subjects)
+
+    grade.moy_cl = moy_cl
+    grade.n_compo = n_compo
+    grade.coef = coef
+    grade.appreciation = get_subject_appreciation(moy_cl, n_compo) # Update with auto-generated appreciation
+    grade.period = period # Update period
+    # grade.date can be updated if needed, e.g., grade.date = datetime.utcnow()
 
-@app.route('/update_grade/<int:grade_id>', methods=['PUT'])
+@bp.route('/update_grade/<int:grade_id>', methods=['PUT'])
 @login_required
 def update_grade(grade_id):
     if current_user.role != 'teacher':
@@ -328,68 +662,424 @@ def update_grade(grade_id):
     if not data:
         return {'error': 'Invalid data'}, 400
 
-    try:
-        moy_cl = float(data.get('moy_cl', grade.moy_cl))
-        n_compo = float(data.get('n_compo', grade.n_compo))
-        coef = int(data.get('coef', grade.coef))
-    except (ValueError, TypeError):
-        return {'error': 'Invalid number format for grades or coefficient.'}, 400
-
-    period = data.get('period', grade.period) # Get period for update
-
-    # Add validation for grade ranges if necessary (e.g., 0-20)
-    if not (0 <= moy_cl <= 20 and 0 <= n_compo <= 20):
-         return {'error': 'Grades must be between 0 and 20.'}, 400
-    if coef <= 0:
-         return {'error': 'Coefficient must be a positive number.'}, 400
-
-    grade.moy_cl = moy_cl
-    grade.n_compo = n_compo
-    grade.coef = coef
-    grade.appreciation = get_subject_appreciation(moy_cl, n_compo) # Update with auto-generated appreciation
-    grade.period = period # Update period
-    # grade.date can be updated if needed, e.g., grade.date = datetime.utcnow()
+    values, error = parse_grade_update(data, grade)
+    if error:
+        return {'error': error}, 400
+    apply_grade_update(grade, **values)
     
     db.session.commit()
+    invalidate_student_caches(grade.student_id)
     return {'message': 'Grade updated successfully'}, 200
 
-@app.route('/delete_grade/<int:grade_id>', methods=['DELETE'])
+@bp.route('/delete_grade/<int:grade_id>', methods=['DELETE'])
 @login_required
 def delete_grade(grade_id):
     if current_user.role != 'teacher':
         return {'error': 'Access denied'}, 403
     
     grade = Grade.query.get_or_404(grade_id)
+    apply_grade_to_summary(grade.student_id, grade.period, grade_subject_key(grade), grade.moy_cl, grade.n_compo, grade.coef, sign=-1)
     db.session.delete(grade)
     db.session.commit()
+    invalidate_student_caches(grade.student_id)
     return {'message': 'Grade deleted successfully'}, 200
 
-@app.route('/student')
+# Maximum number of operations accepted by /grades/batch in one request
+MAX_BATCH_OPERATIONS = 1000
+
+@bp.route('/grades/batch', methods=['POST'])
+@login_required
+def batch_grades():
+    # Applies a list of grade operations atomically: either all of them are saved, or none.
+    #   {"operations": [{"op": "create", "student_id": 3, "subject": "MATHS", "period": "...", "moy_cl": 12, "n_compo": 14, "coef": 2},
+    #                   {"op": "update", "id": 7, "n_compo": 15},
+    #                   {"op": "delete", "id": 9}]}
+    if current_user.role != 'teacher':
+        return {'error': 'Access denied'}, 403
+
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return {'error': 'Invalid data'}, 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return {'error': f'Too many operations (maximum {MAX_BATCH_OPERATIONS}).'}, 400
+    if not all(isinstance(operation, dict) for operation in operations):
+        return {'error': 'Invalid data'}, 400
+
+    # Load every grade and student referenced by the batch in two queries
+    def as_int(value):
+        try:
+            return int(value)
+        except (ValueError, TypeError):
+            return None
+    grade_ids = {as_int(op.get('id')) for op in operations if op.get('op') in ('update', 'delete')}
+    student_ids = {as_int(op.get('student_id')) for op in operations if op.get('op') == 'create'}
+    grades_by_id = {g.id: g for g in Grade.query.filter(Grade.id.in_(grade_ids - {None})).all()} if grade_ids else {}
+    students_by_id = {u.id: u for u in User.query.filter(User.id.in_(student_ids - {None}), User.role == 'student').all()} if student_ids else {}
+
+    # Validate everything before writing anything
+    errors = []
+    planned = []
+    seen_grade_ids = set()
+    for index, operation in enumerate(operations):
+        kind = operation.get('op')
+        if kind == 'create':
+            student = students_by_id.get(as_int(operation.get('student_id')))
+            subject = str(operation.get('subject') or '').strip()
+            if not student:
+                errors.append({'index': index, 'error': 'Student not found'})
+                continue
+            if not subject:
+                errors.append({'index': index, 'error': 'Subject is required.'})
+                continue
+            values, error = parse_grade_update(operation)
+            if error:
+                errors.append({'index': index, 'error': error})
+                continue
+            grade = Grade(student_id=student.id, subject=subject, subject_id=get_subject_id(student.current_class_id, subject), **values)
+            planned.append((kind, grade, None))
+        elif kind in ('update', 'delete'):
+            grade = grades_by_id.get(as_int(operation.get('id')))
+            if not grade:
+                errors.append({'index': index, 'error': 'Grade not found'})
+                continue
+            if grade.id in seen_grade_ids:
+                errors.append({'index': index, 'error': 'Grade is changed by several operations'})
+                continue
+            seen_grade_ids.add(grade.id)
+            values = None
+            if kind == 'update':
+                values, error = parse_grade_update(operation, grade)
+                if error:
+                    errors.append({'index': index, 'error': error})
+                    continue
+            planned.append((kind, grade, values))
+        else:
+            errors.append({'index': index, 'error': f'Unknown operation "{kind}"'})
+
+    if errors:
+        return {'error': f'{len(errors)} operation(s) are invalid, nothing was saved.', 'errors': errors}, 400
+
+    part1_by_student = {}
+    def part1_subjects(student_id):
+        if student_id not in part1_by_student:
+            part1_by_student[student_id] = _summary_part1_subjects(student_id)
+        return part1_by_student[student_id]
+
+    created = []
+    counts = {'update': 0, 'delete': 0}
+    for kind, grade, values in planned:
+        if kind == 'create':
+            grade.appreciation = get_subject_appreciation(grade.moy_cl, grade.n_compo)
+            grade.date = datetime.utcnow()
+            db.session.add(grade)
+            apply_grade_to_summary(grade.student_id, grade.period, grade_subject_key(grade), grade.moy_cl, grade.n_compo, grade.coef,
+                                   part1_subjects=part1_subjects(grade.student_id))
+            created.append(grade)
+        elif kind == 'update':
+            apply_grade_update(grade, part1_subjects=part1_subjects(grade.student_id), **values)
+            counts['update'] += 1
+        else:
+            apply_grade_to_summary(grade.student_id, grade.period, grade_subject_key(grade), grade.moy_cl, grade.n_compo, grade.coef, sign=-1,
+                                   part1_subjects=part1_subjects(grade.student_id))
+            db.session.delete(grade)
+            counts['delete'] += 1
+    db.session.commit()
+    invalidate_student_caches(*{grade.student_id for _kind, grade, _values in planned})
+
+    return {
+        'message': f'{len(planned)} change(s) saved successfully',
+        'created': [grade.id for grade in created],
+        'updated': counts['update'],
+        'deleted': counts['delete']
+    }, 200
+
+@bp.route('/import_grades', methods=['GET', 'POST'])
+@login_required
+def import_grades():
+    if current_user.role != 'teacher':
+        flash('Access denied', 'danger')
+        return redirect(url_for('main.index'))
+
+    render_vars = {
+        'school_classes': SchoolClass.query.order_by(SchoolClass.name).all(),
+        'standard_periods': STANDARD_PERIODS,
+        'selected_class_id': request.form.get('school_class_id', type=int),
+        'selected_period': request.form.get('period'),
+        'report': None
+    }
+    if request.method == 'GET':
+        return render_template('import_grades.html', **render_vars)
+
+    school_class = db.session.get(SchoolClass, render_vars['selected_class_id']) if render_vars['selected_class_id'] else None
+    period = render_vars['selected_period']
+    upload = request.files.get('grades_file')
+    if not school_class or not period or not upload or not upload.filename:
+        flash('Class, period and file are required.', 'danger')
+        return render_template('import_grades.html', **render_vars)
+
+    try:
+        rows = read_grade_rows(upload.filename, upload.read())
+    except GradeImportError as e:
+        flash(str(e), 'danger')
+        return render_template('import_grades.html', **render_vars)
+    if not rows:
+        flash('The file contains no grades.', 'warning')
+        return render_template('import_grades.html', **render_vars)
+
+    # Validate every row in one pass, with the same rules as add_grade
+    students_by_username = {s.username: s for s in User.query.filter_by(current_class_id=school_class.id, role='student').all()}
+    report = []
+    valid_grades = {} # (student_id, subject) -> values
+    for row in rows:
+        entry = {'row': row['row'], 'student': row['student'], 'subject': row['subject'], 'error': None, 'status': None}
+        report.append(entry)
+        student = students_by_username.get(row['student'])
+        if not student:
+            entry['error'] = f'Unknown student "{row["student"]}" in class {school_class.name}.'
+            continue
+        if not row['subject']:
+            entry['error'] = 'Subject is required.'
+            continue
+        try:
+            moy_cl = parse_grade_number(row['moy_cl'])
+            n_compo = parse_grade_number(row['n_compo'])
+            coef_value = parse_grade_number(row['coef'])
+            coef = int(coef_value)
+            if coef != coef_value:
+                raise ValueError(row['coef'])
+        except ValueError:
+            entry['error'] = 'Invalid number format for grades or coefficient.'
+            continue
+        entry['error'] = validate_grade_values(moy_cl, n_compo, coef)
+        if entry['error']:
+            continue
+        key = (student.id, row['subject'])
+        if key in valid_grades:
+            entry['error'] = f'Duplicate of row {valid_grades[key]["entry"]["row"]} (same student and subject).'
+            continue
+        valid_grades[key] = {'moy_cl': moy_cl, 'n_compo': n_compo, 'coef': coef, 'entry': entry}
+
+    error_count = sum(1 for entry in report if entry['error'])
+    if error_count:
+        flash(f'{error_count} row(s) have errors, nothing was imported. Fix them and upload the file again.', 'danger')
+        return render_template('import_grades.html', **dict(render_vars, report=report))
+
+    # Insert or update every grade in a single transaction
+    existing_grades = {}
+    for g in Grade.query.filter(Grade.student_id.in_([s.id for s in students_by_username.values()]), Grade.period == period).all():
+        existing_grades.setdefault((g.student_id, g.subject), g)
+
+    now = datetime.utcnow()
+    created_count = 0
+    for (student_id, subject), values in valid_grades.items():
+        appreciation = get_subject_appreciation(values['moy_cl'], values['n_compo'])
+        grade = existing_grades.get((student_id, subject))
+        if grade:
+            grade.moy_cl = values['moy_cl']
+            grade.n_compo = values['n_compo']
+            grade.coef = values['coef']
+            grade.appreciation = appreciation
+            grade.date = now
+            values['entry']['status'] = 'updated'
+        else:
+            db.session.add(Grade(student_id=student_id, subject=subject, subject_id=get_subject_id(school_class.id, subject),
+                                 moy_cl=values['moy_cl'], n_compo=values['n_compo'], coef=values['coef'],
+                                 appreciation=appreciation, period=period, date=now))
+            values['entry']['status'] = 'added'
+            created_count += 1
+    db.session.flush()
+    rebuild_grade_summaries(school_class.id)
+    db.session.commit()
+    invalidate_student_caches(*{student_id for student_id, _subject in valid_grades})
+
+    flash(f'Imported {len(valid_grades)} grades for {school_class.name} ({period}): '
+          f'{created_count} added, {len(valid_grades) - created_count} updated.', 'success')
+    return render_template('import_grades.html', **dict(render_vars, report=report))
+
+@bp.route('/student')
 @login_required
 def student_interface():
     if current_user.role != 'student':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
-    grades = Grade.query.filter_by(student_id=current_user.id).all()
-    return render_template('student.html', grades=grades)
+        return redirect(url_for('main.index'))
+    # The grades are loaded by the page from /api/student_summary
+    return render_template('student.html', standard_periods=STANDARD_PERIODS)
+
+# Validators of a student's dashboard data. Every grade change updates the student's GradeSummary rows
+# (see apply_grade_to_summary), so they change whenever the aggregates can; the subject order of the
+# class's bulletin structure is part of the ETag too.
+def student_summary_validators(student, summaries):
+    state = [(s.period, s.grade_count, s.total_coef, s.total_moy_coef, s.updated_at.isoformat()) for s in summaries]
+    subject_orders = get_bulletin_subject_orders(student.current_class_id)
+    etag = hashlib.sha1(repr((student.id, student.current_class_id, subject_orders, state)).encode()).hexdigest()
+    last_modified = max((s.updated_at for s in summaries), default=None)
+    return etag, last_modified
+
+# Per-period, per-subject aggregates of a student's grades, in bulletin order. Several grades of the same
+# subject in a period are combined like in the grade summaries: MG = Σ(MG·k) / Σk over the grades.
+def build_student_summary(student, summaries):
+    subject_mg = subject_average(Grade.moy_cl, Grade.n_compo)
+    rows = db.session.query(
+        Grade.period, Grade.subject_id, Grade.subject, func.count(Grade.id), func.sum(Grade.coef), func.sum(subject_mg * Grade.coef)
+    ).filter(Grade.student_id == student.id).group_by(Grade.period, Grade.subject_id, Grade.subject).all()
+
+    subjects_part1, subjects_part2 = get_bulletin_subjects(student.current_class_id)
+    subject_positions = {key: i for i, (key, _name) in enumerate(subjects_part1 + subjects_part2)}
+    subjects_by_period = {}
+    for period, subject_id, subject, grade_count, total_coef, total_moy_coef in rows:
+        mg = weighted_average(total_moy_coef, total_coef)
+        position = subject_positions.get(subject_id if subject_id is not None else subject, len(subject_positions))
+        subjects_by_period.setdefault(period, []).append((position, {
+            'subject': subject,
+            'grade_count': grade_count,
+            'coef': total_coef,
+            'mg': mg,
+            'moy_coef': total_moy_coef,
+            'appreciation': get_appreciation_for_average(mg)
+        }))
+
+    summaries_by_period = {s.period: s for s in summaries}
+    periods = [p for p in STANDARD_PERIODS if p in subjects_by_period]
+    periods += sorted(p for p in subjects_by_period if p not in STANDARD_PERIODS)
+    period_data = []
+    for period in periods:
+        summary = summaries_by_period.get(period)
+        average = summary.average if summary else None
+        period_data.append({
+            'period': period,
+            'average': average,
+            'appreciation': get_appreciation_for_average(average) if average is not None else None,
+            'subjects': [subject for _position, subject in sorted(subjects_by_period[period],
+                                                                  key=lambda item: (item[0], item[1]['subject']))]
+        })
+    averages = [p['average'] for p in period_data if p['period'] in STANDARD_PERIODS and p['average'] is not None]
+    return {
+        'student': student.username,
+        'class_name': student.current_class_name,
+        'periods': period_data,
+        'annual_average': sum(averages) / len(averages) if averages else None
+    }
 
-@app.route('/manage_bulletin_structures')
+@bp.route('/api/student_summary')
+@login_required
+def api_student_summary():
+    if current_user.role != 'student':
+        return {'error': 'Access denied'}, 403
+
+    # The validators only need the (at most one per period) summary rows: an unchanged dashboard costs a 304
+    # without aggregating the grades
+    summaries = GradeSummary.query.filter_by(student_id=current_user.id).all()
+    etag, last_modified = student_summary_validators(current_user, summaries)
+    headers = {'ETag': quote_etag(etag), 'Cache-Control': 'private, no-cache'} # Cached by the browser, revalidated on each load
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return '', 304, headers
+    return build_student_summary(current_user, summaries), 200, headers
+
+# Helpers for bulletin structures and their normalized subjects
+def parse_subject_list(subjects_text):
+    return [s.strip() for s in (subjects_text or '').split(',') if s.strip()]
+
+def set_structure_subjects(structure, subjects_part1, subjects_part2):
+    # Store the comma-separated lists and sync the Subject rows. Subjects that stay in the structure keep
+    # their id (and their grades), a subject listed twice keeps its first place.
+    structure.subjects_part1 = subjects_part1
+    structure.subjects_part2 = subjects_part2
+    existing_subjects = {subject.name: subject for subject in structure.subjects}
+    kept_names = set()
+    for part, subjects_text in ((1, subjects_part1), (2, subjects_part2)):
+        position = 0
+        for name in parse_subject_list(subjects_text):
+            if name in kept_names:
+                continue
+            kept_names.add(name)
+            subject = existing_subjects.get(name)
+            if not subject:
+                subject = Subject(name=name)
+                structure.subjects.append(subject)
+            subject.part = part
+            subject.position = position
+            position += 1
+    removed_subjects = [subject for name, subject in existing_subjects.items() if name not in kept_names]
+    unlink_subjects(removed_subjects)
+    for subject in removed_subjects:
+        structure.subjects.remove(subject)
+
+def unlink_subjects(subjects):
+    # Detach grades from subjects that are about to be deleted
+    subject_ids = [subject.id for subject in subjects if subject.id is not None]
+    if subject_ids:
+        Grade.query.filter(Grade.subject_id.in_(subject_ids)).update({Grade.subject_id: None}, synchronize_session=False)
+
+def link_grade_subjects(school_class_id):
+    # Point Grade.subject_id of the class's students to the subjects of the class's current structure
+    subject_ids = {subject.name: subject.id for subject in Subject.query.join(BulletinStructure).filter(
+        BulletinStructure.school_class_id == school_class_id)}
+    student_ids = db.session.query(User.id).filter(User.current_class_id == school_class_id, User.role == 'student')
+    for grade in Grade.query.filter(Grade.student_id.in_(student_ids.scalar_subquery())):
+        grade.subject_id = subject_ids.get(grade.subject)
+
+# Process-level cache of the parsed bulletin structure of each class (school_class_id -> ParsedStructure,
+# or None for a class without structure), so that requests don't reload and re-split it.
+# Cleared by invalidate_structure_cache() whenever a structure is added, edited or deleted, in the other
+# worker processes through publish_cache_invalidation('structures').
+ParsedStructure = namedtuple('ParsedStructure', ['class_name', 'subjects_part1', 'subjects_part2', 'subject_ids'])
+_parsed_structures = {}
+
+def get_parsed_structure(school_class_id):
+    if not school_class_id:
+        return None
+    school_class_id = int(school_class_id)
+    sync_process_caches()
+    try:
+        return _parsed_structures[school_class_id]
+    except KeyError:
+        pass
+    structure = BulletinStructure.query.options(selectinload(BulletinStructure.subjects)).filter_by(
+        school_class_id=school_class_id).first()
+    parsed = None
+    if structure:
+        parsed = ParsedStructure(
+            class_name=structure.school_class.name,
+            subjects_part1=tuple(subject.name for subject in structure.subjects if subject.part == 1),
+            subjects_part2=tuple(subject.name for subject in structure.subjects if subject.part == 2),
+            subject_ids={subject.name: subject.id for subject in structure.subjects}
+        )
+    _parsed_structures[school_class_id] = parsed
+    return parsed
+
+def invalidate_structure_cache():
+    _parsed_structures.clear()
+
+# Id of the Subject a grade of this class and subject name belongs to, None if it's not in the class's structure
+def get_subject_id(school_class_id, subject_name):
+    parsed = get_parsed_structure(school_class_id)
+    return parsed.subject_ids.get(subject_name) if parsed else None
+
+# Key matching a grade to the subjects of its bulletin: the id of its Subject, or its name for a grade outside
+# the class's structure (classes using the default layout, subjects typed with "Other")
+def grade_subject_key(grade):
+    return grade.subject_id if grade.subject_id is not None else grade.subject
+
+@bp.route('/manage_bulletin_structures')
 @login_required
 def manage_bulletin_structures():
     if current_user.role != 'teacher':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     structures = BulletinStructure.query.join(SchoolClass).order_by(SchoolClass.name).all()
     all_school_classes = SchoolClass.query.order_by(SchoolClass.name).all()
     return render_template('manage_bulletin_structures.html', structures=structures, school_classes=all_school_classes)
 
-@app.route('/add_bulletin_structure', methods=['POST'])
+@bp.route('/add_bulletin_structure', methods=['POST'])
 @login_required
 def add_bulletin_structure():
     if current_user.role != 'teacher':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     school_class_id = request.form.get('school_class_id')
     subjects_part1 = request.form.get('subjects_part1')
@@ -397,25 +1087,28 @@ def add_bulletin_structure():
 
     if not all([school_class_id, subjects_part1, subjects_part2]):
         flash('All fields are required.', 'danger')
-        return redirect(url_for('manage_bulletin_structures'))
+        return redirect(url_for('main.manage_bulletin_structures'))
 
     existing_structure = BulletinStructure.query.filter_by(school_class_id=school_class_id).first()
     if existing_structure:
         school_class = db.session.get(SchoolClass, school_class_id)
         flash(f'A bulletin structure for class "{school_class.name if school_class else school_class_id}" already exists.', 'warning')
-        return redirect(url_for('manage_bulletin_structures'))
+        return redirect(url_for('main.manage_bulletin_structures'))
 
-    new_structure = BulletinStructure(
-        school_class_id=school_class_id,
-        subjects_part1=subjects_part1,
-        subjects_part2=subjects_part2
-    )
+    new_structure = BulletinStructure(school_class_id=school_class_id)
+    set_structure_subjects(new_structure, subjects_part1, subjects_part2)
     db.session.add(new_structure)
+    db.session.flush()
+    invalidate_structure_cache()
+    link_grade_subjects(int(school_class_id))
+    rebuild_grade_summaries(int(school_class_id)) # Part 1/part 2 subtotals depend on the structure
     db.session.commit()
+    invalidate_structure_cache() # Also drop entries cached by concurrent requests before the commit
+    publish_cache_invalidation('structures')
     flash('Bulletin structure added successfully!', 'success')
-    return redirect(url_for('manage_bulletin_structures'))
+    return redirect(url_for('main.manage_bulletin_structures'))
 
-@app.route('/delete_bulletin_structure/<int:structure_id>', methods=['POST'])
+@bp.route('/delete_bulletin_structure/<int:structure_id>', methods=['POST'])
 @login_required
 def delete_bulletin_structure(structure_id):
     if current_user.role != 'teacher':
@@ -423,12 +1116,19 @@ def delete_bulletin_structure(structure_id):
         # For AJAX requests, might return JSON error, for form posts, redirect
         if request.is_json:
             return {'error': 'Access denied'}, 403
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     structure = db.session.get(BulletinStructure, structure_id)
     if structure:
+        school_class_id = structure.school_class_id
+        unlink_subjects(structure.subjects)
         db.session.delete(structure)
+        db.session.flush()
+        invalidate_structure_cache()
+        rebuild_grade_summaries(school_class_id)
         db.session.commit()
+        invalidate_structure_cache() # Also drop entries cached by concurrent requests before the commit
+        publish_cache_invalidation('structures')
         flash('Bulletin structure deleted successfully!', 'success')
         if request.is_json:
             return {'message': 'Bulletin structure deleted successfully!'}, 200
@@ -437,19 +1137,19 @@ def delete_bulletin_structure(structure_id):
         if request.is_json:
             return {'error': 'Bulletin structure not found'}, 404
             
-    return redirect(url_for('manage_bulletin_structures'))
+    return redirect(url_for('main.manage_bulletin_structures'))
 
-@app.route('/edit_bulletin_structure/<int:structure_id>', methods=['POST'])
+@bp.route('/edit_bulletin_structure/<int:structure_id>', methods=['POST'])
 @login_required
 def edit_bulletin_structure(structure_id):
     if current_user.role != 'teacher':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     structure_to_edit = db.session.get(BulletinStructure, structure_id)
     if not structure_to_edit:
         flash('Bulletin structure not found.', 'danger')
-        return redirect(url_for('manage_bulletin_structures'))
+        return redirect(url_for('main.manage_bulletin_structures'))
 
     new_school_class_id = request.form.get('school_class_id') # Changed from class_name
     subjects_part1 = request.form.get('subjects_part1')
@@ -457,7 +1157,7 @@ def edit_bulletin_structure(structure_id):
 
     if not all([new_school_class_id, subjects_part1, subjects_part2]):
         flash('All fields are required for update.', 'danger')
-        return redirect(url_for('manage_bulletin_structures'))
+        return redirect(url_for('main.manage_bulletin_structures'))
 
     # Check if another structure with the new school_class_id already exists
     conflicting_structure = BulletinStructure.query.filter(
@@ -468,248 +1168,556 @@ def edit_bulletin_structure(structure_id):
     if conflicting_structure:
         conflicting_class = db.session.get(SchoolClass, new_school_class_id)
         flash(f'Another bulletin structure for the class "{conflicting_class.name if conflicting_class else new_school_class_id}" already exists.', 'warning')
-        return redirect(url_for('manage_bulletin_structures'))
+        return redirect(url_for('main.manage_bulletin_structures'))
 
+    old_school_class_id = structure_to_edit.school_class_id
     structure_to_edit.school_class_id = new_school_class_id
-    structure_to_edit.subjects_part1 = subjects_part1
-    structure_to_edit.subjects_part2 = subjects_part2
+    set_structure_subjects(structure_to_edit, subjects_part1, subjects_part2)
+    db.session.flush()
+    invalidate_structure_cache()
+    for affected_class_id in {old_school_class_id, int(new_school_class_id)}:
+        link_grade_subjects(affected_class_id)
+        rebuild_grade_summaries(affected_class_id)
     
     db.session.commit()
+    invalidate_structure_cache() # Also drop entries cached by concurrent requests before the commit
+    publish_cache_invalidation('structures')
     flash('Bulletin structure updated successfully!', 'success')
-    return redirect(url_for('manage_bulletin_structures'))
-
-@app.route('/generate_report', methods=['GET', 'POST'])
-@login_required
-def generate_report():
-    if current_user.role != 'student':
-        flash('Access denied', 'danger')
-        return redirect(url_for('index'))
-    
-    # --- Data Retrieval and Structuring for PDF ---
-    
-    # Determine the period for the report
-    # Option 1: Get it from request arguments (if student can select)
-    requested_period = request.args.get('period') 
-    
-    # Option 2: Determine a default period (e.g., latest period with grades for this student)
-    if not requested_period:
-        latest_grade_for_period = Grade.query.filter_by(student_id=current_user.id).order_by(Grade.date.desc()).first()
-        if latest_grade_for_period:
-            requested_period = latest_grade_for_period.period
+    return redirect(url_for('main.manage_bulletin_structures'))
+
+def format_rank(position, tied=False):
+    return f"{position}er/ère" + (" ex æquo" if tied else "")
+
+def format_average(avg):
+    return f"{avg:.2f}/20".replace('.',',')
+
+# Ranking of a class for a period in a single query over GradeSummary (one row per student):
+# the cached weighted average Σ((m+2n)/3·k) / Σk, ranked with RANK() OVER (PARTITION BY class, period).
+# The summaries are maintained incrementally, so equal averages may differ in their last bits (a grade
+# edited then restored does not always give back the same float): averages are compared rounded to
+# RANKING_PRECISION decimals, which keeps such students ex æquo.
+RANKING_PRECISION = 6
+
+def _class_ranking_subquery(school_class_id, period):
+    student_averages = db.session.query(
+        GradeSummary.student_id.label('student_id'),
+        User.current_class_id.label('class_id'),
+        GradeSummary.period.label('period'),
+        func.round(GradeSummary.average, RANKING_PRECISION).label('average')
+    ).join(User, GradeSummary.student_id == User.id).filter(
+        User.current_class_id == school_class_id,
+        User.role == 'student',
+        GradeSummary.period == period,
+        GradeSummary.average.isnot(None)
+    ).subquery()
+
+    class_period = (student_averages.c.class_id, student_averages.c.period)
+    return db.session.query(
+        student_averages.c.student_id,
+        student_averages.c.average,
+        func.rank().over(partition_by=class_period, order_by=student_averages.c.average.desc()).label('rank'),
+        func.max(student_averages.c.average).over(partition_by=class_period).label('top_average'),
+        func.count().over(partition_by=class_period + (student_averages.c.average,)).label('tied_count'),
+        func.count().over(partition_by=class_period).label('class_size')
+    ).subquery()
+
+# Returns the ranking of every student with grades in the class for the period, best first.
+# Each entry has: student_id, average, rank, top_average, tied_count, class_size
+def get_class_rankings(school_class_id, period):
+    ranked = _class_ranking_subquery(school_class_id, period)
+    rows = db.session.query(ranked).order_by(ranked.c.rank, ranked.c.student_id).all()
+    return [dict(row._mapping) for row in rows]
+
+# Same as get_class_rankings for a single student, None if the student has no grades for the period
+def get_student_rank(student_id, school_class_id, period):
+    ranked = _class_ranking_subquery(school_class_id, period)
+    row = db.session.query(ranked).filter(ranked.c.student_id == student_id).first()
+    return dict(row._mapping) if row else None
+
+# Process-level cache of each student's averages for the STANDARD_PERIODS (student_id -> {period: average}),
+# read from GradeSummary so that a bulletin never re-aggregates the year from raw grades.
+# Entries are dropped by invalidate_student_caches() when the student's grades change (the whole cache in the
+# other worker processes, see sync_process_caches); the generation counter keeps a request that read the
+# database before an invalidation from caching outdated values.
+_period_averages = {}
+_period_averages_generation = 0
+_period_averages_lock = threading.Lock()
+
+def get_period_averages(student_ids):
+    # Returns {student_id: {period: average}}, loading the students missing from the cache in one query
+    sync_process_caches()
+    averages = {}
+    for student_id in map(int, student_ids):
+        cached = _period_averages.get(student_id)
+        if cached is not None:
+            averages[student_id] = cached
+    missing_ids = [student_id for student_id in map(int, student_ids) if student_id not in averages]
+    if missing_ids:
+        generation = _period_averages_generation
+        loaded = {student_id: {} for student_id in missing_ids}
+        summaries = db.session.query(GradeSummary.student_id, GradeSummary.period, GradeSummary.average).filter(
+            GradeSummary.student_id.in_(missing_ids),
+            GradeSummary.period.in_(STANDARD_PERIODS),
+            GradeSummary.average.isnot(None)
+        )
+        for student_id, period, average in summaries:
+            loaded[student_id][period] = average
+        with _period_averages_lock:
+            if generation == _period_averages_generation: # Otherwise grades changed meanwhile, don't cache
+                _period_averages.update(loaded)
+        averages.update(loaded)
+    return averages
+
+def invalidate_period_averages(student_id=None):
+    # student_id None: every student
+    global _period_averages_generation
+    with _period_averages_lock:
+        _period_averages_generation += 1
+        if student_id is None:
+            _period_averages.clear()
         else:
-            # Fallback if no grades/period found, or set a default like "Overall" or current school period
-            requested_period = "Période Actuelle" # Placeholder - Define how to get current school period
+            _period_averages.pop(int(student_id), None)
+
+# Drop everything cached about students after their grades changed (call it once the change is committed)
+def invalidate_student_caches(*student_ids):
+    for student_id in student_ids:
+        bulletin_cache.invalidate_student(student_id)
+        invalidate_period_averages(student_id)
+    if student_ids:
+        publish_cache_invalidation('period_averages')
+
+# Each worker process (gunicorn runs several) has its own copy of the process-level caches, so invalidations
+# are also published in the CacheGeneration table. Before a request first reads one of these caches, the
+# process compares the rows with the generations it last saw (one query on a tiny table, see
+# sync_process_caches) and clears the caches another process changed; requests that read none of them,
+# e.g. those only loading the logged-in user, issue no query for it.
+PROCESS_CACHES = {
+    'structures': invalidate_structure_cache,
+    'period_averages': invalidate_period_averages,
+}
+_seen_cache_generations = {}
+_seen_cache_generations_lock = threading.Lock()
+
+def publish_cache_invalidation(name):
+    # Bumps the generation in its own short transaction: call it after the change itself is committed
+    generation = db.session.execute(
+        sqlite_insert(CacheGeneration).values(name=name, generation=1).on_conflict_do_update(
+            index_elements=[CacheGeneration.name], set_={'generation': CacheGeneration.generation + 1}
+        ).returning(CacheGeneration.generation)
+    ).scalar()
+    db.session.commit()
+    with _seen_cache_generations_lock:
+        # This process already dropped its own stale entries: unless another process published meanwhile,
+        # it does not need to clear the whole cache on its next request
+        if _seen_cache_generations.get(name) == generation - 1:
+            _seen_cache_generations[name] = generation
+
+def sync_process_caches():
+    # Called by the cache readers, runs at most once per request (or app context)
+    if g.get('process_caches_synced'):
+        return
+    g.process_caches_synced = True
+    try:
+        generations = dict(db.session.query(CacheGeneration.name, CacheGeneration.generation))
+    except OperationalError: # No cache_generation table yet (database not upgraded): nothing was published
+        generations = {}
+    with _seen_cache_generations_lock:
+        for name, invalidate_cache in PROCESS_CACHES.items():
+            generation = generations.get(name, 0)
+            if _seen_cache_generations.get(name) != generation:
+                invalidate_cache()
+                _seen_cache_generations[name] = generation
+
+# Averages shown at the bottom of a bulletin: each standard period up to the bulletin's period (all of
+# them for a non-standard period), and the annual average, the mean of the available period averages.
+def build_period_averages_summary(period_averages, requested_period):
+    periods = STANDARD_PERIODS
+    if requested_period in STANDARD_PERIODS:
+        periods = STANDARD_PERIODS[:STANDARD_PERIODS.index(requested_period) + 1]
+    averages = [period_averages[p] for p in periods if p in period_averages]
+    annual_average = sum(averages) / len(averages) if averages else None
+    return {
+        'period_averages': [(p, format_period_average(period_averages.get(p) if p in periods else None)) for p in STANDARD_PERIODS],
+        'moy_annuelle': format_period_average(annual_average)
+    }
+
+def format_period_average(avg):
+    return f"{avg:.2f} /20".replace('.',',') if avg is not None else "-"
+
+# Convert a Grade object to the bulletin row format expected by pdf_generator
+def format_grade_for_pdf(g):
+    return make_bulletin_row(g.subject, g.moy_cl, g.n_compo, g.coef, g.appreciation if g.appreciation else '') # Ensure not None
 
-    student_data = {
+def build_student_data(student_name, class_name, period):
+    return {
         'school_name': 'Lycée Michel ALLAIRE', 
         'school_bp': '580',
         'school_tel': '21-32-11-20',
         'school_email': 'michelallaire2007@yahoo.fr',
         'school_tel_alt': '79 07 03 60',
-        'academic_period': requested_period, # Use the determined period
-        'student_name': current_user.username.upper(), 
-        'class_name': current_user.current_class.name if current_user.current_class else 'Classe Inconnue',
+        'academic_period': period,
+        'student_name': student_name.upper(), 
+        'class_name': class_name if class_name else 'Classe Inconnue',
         'school_stamp_path': None
     }
 
-    # 2. Grades Data - Filter by the determined period
-    all_student_grades_for_period = Grade.query.filter_by(student_id=current_user.id, period=requested_period).order_by(Grade.subject).all()
-
-    # Convert Grade objects to list of dictionaries expected by pdf_generator
-    formatted_grades = []
-    for g in all_student_grades_for_period:
-        formatted_grades.append({
-            'subject': g.subject,
-            'moy_cl': g.moy_cl,
-            'n_compo': g.n_compo,
-            'coef': g.coef,
-            'appreciation': g.appreciation if g.appreciation else '' # Ensure not None
-        })
-
-    # TODO: Implement logic to split formatted_grades into grades_part1 and grades_part2
-    # This logic depends on how you want to group subjects in the PDF.
-    # Example: by a predefined list of subjects for part 1, or first N subjects.
-    # For now, a simple split (e.g., first 6 subjects for part1, rest for part2)
-    
-    # Define subjects for Part 1 (as per the example image)
-    default_subjects_part1_order = ['MATHS', 'PHYSIQUE', 'CHIMIE', 'GÉOLOGIE/BIO', 'PHILOSOPHIE', 'ANGLAIS']
-    default_subjects_part2_order = ['E.C.M', 'EPS', 'INFORMAT.', 'DESSIN TECH.', 'CONDUITE'] # And any others
-
-    subjects_part1_order = default_subjects_part1_order
-    subjects_part2_order = default_subjects_part2_order
-
-    if current_user.current_class_id: # Check if current_class_id exists
-        # Fetch bulletin structure based on school_class_id
-        bulletin_struct = BulletinStructure.query.filter_by(school_class_id=current_user.current_class_id).first()
-        if bulletin_struct and bulletin_struct.school_class: # Ensure school_class is loaded
-            subjects_part1_order = [s.strip() for s in bulletin_struct.subjects_part1.split(',') if s.strip()]
-            subjects_part2_order = [s.strip() for s in bulletin_struct.subjects_part2.split(',') if s.strip()]
-            app.logger.info(f"Using bulletin structure for class: {bulletin_struct.school_class.name}")
-        elif current_user.current_class: # Fallback if structure not found but class exists
-             app.logger.info(f"No specific bulletin structure for class: {current_user.current_class.name}. Using default.")
-        else:
-            app.logger.info("User has no current_class or structure not found. Using default bulletin structure.")
+# Returns the (part 1, part 2) subject order of the bulletin for a class, falling back to the default layout
+def get_bulletin_subject_orders(school_class_id):
+    if school_class_id:
+        parsed = get_parsed_structure(school_class_id)
+        if parsed:
+            current_app.logger.debug(f"Using bulletin structure for class: {parsed.class_name}")
+            return list(parsed.subjects_part1), list(parsed.subjects_part2)
+        current_app.logger.info(f"No specific bulletin structure for class id {school_class_id}. Using default.")
     else:
-        app.logger.info("User has no current_class_id. Using default bulletin structure.")
+        current_app.logger.info("No class given. Using default bulletin structure.")
+    return DEFAULT_SUBJECTS_PART1, DEFAULT_SUBJECTS_PART2
+
+# The (part 1, part 2) subjects of get_bulletin_subject_orders as (key, name) pairs, keyed like grade_subject_key
+def get_bulletin_subjects(school_class_id):
+    parsed = get_parsed_structure(school_class_id)
+    subject_ids = parsed.subject_ids if parsed else {}
+    return tuple([(subject_ids.get(name, name), name) for name in subjects]
+                 for subjects in get_bulletin_subject_orders(school_class_id))
+
+# Summary of a bulletin: the subtotals/averages/appreciations computed once by grading.compute_bulletin_totals
+# (the PDF only formats them), the rank, and the averages of the periods of the year (see get_period_averages)
+def build_summary_data(grades_part1, grades_part2, current_rank, rank_1_moy_val, period_averages, requested_period):
+    return {
+        **compute_bulletin_totals(grades_part1, grades_part2),
+        **build_period_averages_summary(period_averages, requested_period),
+        'rank': current_rank,
+        'date_generated': datetime.now().strftime('%d/%m/%Y'),
+        'rank_1_moy': rank_1_moy_val
+    }
+
+# pdf_generator imports all of ReportLab, a large part of the app's import time: it is only imported by the first render
+def render_bulletin_pdf(output, student_data, grades_part1, grades_part2, summary_data):
+    from pdf_generator import generate_bulletin_pdf
+    generate_bulletin_pdf(output, student_data, grades_part1, grades_part2, summary_data,
+                          compact=current_app.config['BULLETIN_PDF_COMPACT'])
+
+def render_class_bulletins_pdf(output, bulletins):
+    from pdf_generator import generate_class_bulletins_pdf
+    generate_class_bulletins_pdf(output, bulletins, compact=current_app.config['BULLETIN_PDF_COMPACT'])
+
+# Import ReportLab and render a throwaway bulletin, which loads what every render shares process-wide: the
+# modules, font metrics and parser state. Production servers call it before forking their workers (see
+# wsgi.py), which inherit all of it. The BulletinTemplate built on the way is not shared: each request thread
+# builds its own on its first render (a few milliseconds, see get_bulletin_template).
+def preload_pdf_renderer():
+    from pdf_generator import generate_bulletin_pdf
+    grades_part1, grades_part2 = split_grades_for_bulletin([], *([(name, name) for name in subjects]
+                                                                 for subjects in (DEFAULT_SUBJECTS_PART1, DEFAULT_SUBJECTS_PART2)))
+    summary_data = build_summary_data(grades_part1, grades_part2, 'N/A', 'N/A', {}, STANDARD_PERIODS[0])
+    generate_bulletin_pdf(io.BytesIO(), build_student_data('', None, STANDARD_PERIODS[0]), grades_part1, grades_part2, summary_data)
+
+# Render a PDF in memory with render_pdf(buffer) and send the bytes, without touching the filesystem.
+# kind labels the render time in the metrics (see pdf_render_timer).
+def send_generated_pdf(render_pdf, kind, download_name, error_endpoint):
+    try:
+        buffer = io.BytesIO()
+        with pdf_render_timer(kind):
+            render_pdf(buffer)
+        buffer.seek(0)
+        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=download_name)
+    except Exception as e:
+        current_app.logger.error(f"Error generating or sending {download_name} for {current_user.username}: {e}", exc_info=True)
+        flash(f'Error generating report card. Please contact support. Error: {e}', 'danger')
+        return redirect(url_for(error_endpoint))
+
+# Send a student's bulletin from the PDF cache, rendering it only if this exact content was never rendered before
+# generation: the student's bulletin cache generation, read before the bulletin data was gathered
+def send_cached_bulletin(student_id, generation, student_data, grades_part1, grades_part2, summary_data, download_name, error_endpoint):
+    try:
+        cache_key = bulletin_cache.make_key(student_data, grades_part1, grades_part2, summary_data)
+        pdf_path = bulletin_cache.get(student_id, cache_key)
+        if pdf_path:
+            return send_file(pdf_path, mimetype='application/pdf', as_attachment=True, download_name=download_name)
+
+        # Cache miss: render in memory, answer from the buffer and keep a copy for the next download
+        buffer = io.BytesIO()
+        with pdf_render_timer('bulletin'):
+            render_bulletin_pdf(buffer, student_data, grades_part1, grades_part2, summary_data)
+        pdf_bytes = buffer.getvalue()
+        bulletin_cache.put(student_id, cache_key, pdf_bytes, generation)
+        return send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True, download_name=download_name)
+    except Exception as e:
+        current_app.logger.error(f"Error generating or sending {download_name} for {current_user.username}: {e}", exc_info=True)
+        flash(f'Error generating report card. Please contact support. Error: {e}', 'danger')
+        return redirect(url_for(error_endpoint))
+
+# Period of a student's bulletin when none is requested: the period of their latest grade
+def get_default_bulletin_period(student_id):
+    latest_grade_for_period = Grade.query.filter_by(student_id=student_id).order_by(Grade.date.desc()).first()
+    if latest_grade_for_period:
+        return latest_grade_for_period.period
+    # Fallback if no grades/period found, or set a default like "Overall" or current school period
+    return "Période Actuelle" # Placeholder - Define how to get current school period
+
+# Everything generate_bulletin_pdf needs for one student's bulletin: (student_data, grades_part1, grades_part2, summary_data)
+def build_student_bulletin(student, requested_period):
+    student_data = build_student_data(
+        student.username,
+        student.current_class_name,
+        requested_period
+    )
 
+    # Grades Data - Filter by the determined period
+    all_student_grades_for_period = Grade.query.filter_by(student_id=student.id, period=requested_period).order_by(Grade.subject).all()
+    formatted_grades = [(grade_subject_key(g), format_grade_for_pdf(g)) for g in all_student_grades_for_period]
 
-    grades_part1 = []
-    grades_part2 = []
-    
-    temp_formatted_grades = list(formatted_grades) # Create a copy to remove items from
-
-    for subj_name in subjects_part1_order:
-        found = False
-        for i, grade_item in enumerate(temp_formatted_grades):
-            if grade_item['subject'] == subj_name:
-                grades_part1.append(temp_formatted_grades.pop(i))
-                found = True
-                break
-        if not found: # Add placeholder if subject not found for this student
-            grades_part1.append({'subject': subj_name, 'moy_cl': 0, 'n_compo': 0, 'coef': 0, 'appreciation': 'N/A'})
-            
-    # Any remaining grades or predefined Part 2 subjects
-    for subj_name in subjects_part2_order:
-        found = False
-        for i, grade_item in enumerate(temp_formatted_grades):
-            if grade_item['subject'] == subj_name:
-                grades_part2.append(temp_formatted_grades.pop(i))
-                found = True
-                break
-        if not found:
-             grades_part2.append({'subject': subj_name, 'moy_cl': 0, 'n_compo': 0, 'coef': 0, 'appreciation': 'N/A'})
-    
-    # Add any other grades not in predefined lists to part 2 (or handle as needed)
-    grades_part2.extend(temp_formatted_grades)
-
-
-    if not grades_part1: # Ensure it's not empty for the PDF generator
-        grades_part1 = [{'subject': 'N/A', 'moy_cl': 0, 'n_compo': 0, 'coef': 0, 'appreciation': '-'}]
-    # grades_part2 can be empty if no subjects fall into it. The PDF generator should handle it.
-
-    # 3. Summary Data (Requires significant calculation logic)
-    # Helper function to calculate weighted average for a list of grades
-    def calculate_moy_ponderee(grades_list):
-        total_moy_coef = 0
-        total_coef = 0
-        for item in grades_list:
-            m = item.get('moy_cl', 0)
-            n = item.get('n_compo', 0)
-            k = item.get('coef', 0)
-            mg = (m + 2 * n) / 3.0 if k > 0 else 0.0
-            total_moy_coef += mg * k
-            total_coef += k
-        return (total_moy_coef / total_coef) if total_coef > 0 else 0.0
-
-    # Helper function to determine appreciation based on average
-    def get_appreciation_for_average(avg):
-        if avg >= 16: return "Très Bien"
-        if avg >= 14: return "Bien"
-        if avg >= 12: return "Assez Bien"
-        if avg >= 10: return "Passable"
-        if avg >= 8: return "Insuffisant"
-        return "Faible"
-
-    moy_p1_calc = calculate_moy_ponderee(grades_part1)
-    moy_p2_calc = calculate_moy_ponderee(grades_part2)
-    
-    all_calculated_grades = grades_part1 + grades_part2 # Use the structured lists
-    moy_annuelle_calc = calculate_moy_ponderee(all_calculated_grades)
+    subjects_part1, subjects_part2 = get_bulletin_subjects(student.current_class_id)
+    grades_part1, grades_part2 = split_grades_for_bulletin(formatted_grades, subjects_part1, subjects_part2)
 
-    # Calculate rank and top student average for the current_user, class, and period
+    # Summary Data
+    # Calculate rank and top student average for the student, class, and period
     current_rank = "N/A"
     rank_1_moy_val = "N/A"
     
-    if current_user.current_class and requested_period:
-        students_in_class = User.query.filter_by(current_class_id=current_user.current_class_id, role='student').all()
-        student_averages = []
-        for student_in_class in students_in_class:
-            grades_for_student_in_class = Grade.query.filter_by(student_id=student_in_class.id, period=requested_period).all()
-            if grades_for_student_in_class: # Only consider students with grades in this period
-                # Convert to the dictionary format for calculate_moy_ponderee
-                formatted_grades_for_calc = [
-                    {'moy_cl': g.moy_cl, 'n_compo': g.n_compo, 'coef': g.coef}
-                    for g in grades_for_student_in_class
-                ]
-                avg = calculate_moy_ponderee(formatted_grades_for_calc)
-                student_averages.append({'student_id': student_in_class.id, 'average': avg})
-        
-        if student_averages:
-            # Sort students by average descending
-            student_averages.sort(key=lambda x: x['average'], reverse=True)
-            
-            # Find rank of current_user
-            for i, data in enumerate(student_averages):
-                if data['student_id'] == current_user.id:
-                    current_rank = f"{i + 1}er/ère"
-                    break # Found current student's rank
-            
-            # Get average of the top student (rank 1)
-            if student_averages: # Check again in case current student had no grades and list became empty
-                 rank_1_moy_val = f"{student_averages[0]['average']:.2f}/20".replace('.',',')
-
-    summary_data = {
-        'appr_p1': get_appreciation_for_average(moy_p1_calc), 
-        'appr_p2': get_appreciation_for_average(moy_p2_calc), 
-        'appr_globale': get_appreciation_for_average(moy_annuelle_calc), 
-        'rank': current_rank,
-        'date_generated': datetime.now().strftime('%d/%m/%Y'),
-        'rank_1_moy': rank_1_moy_val, 
-        'moy_p1_overall': f"{moy_p1_calc:.2f} /20".replace('.',','),
-        'moy_p2_overall': f"{moy_p2_calc:.2f} /20".replace('.',','),
-        'moy_annuelle': f"{moy_annuelle_calc:.2f} /20".replace('.',',')
-    }
-    # --- End of Data Retrieval and Structuring ---
+    if student.current_class_id and requested_period:
+        ranking = get_student_rank(student.id, student.current_class_id, requested_period)
+        if ranking:
+            current_rank = format_rank(ranking['rank'], ranking['tied_count'] > 1)
+            rank_1_moy_val = format_average(ranking['top_average'])
+
+    period_averages = get_period_averages([student.id])[student.id]
+    summary_data = build_summary_data(grades_part1, grades_part2, current_rank, rank_1_moy_val, period_averages, requested_period)
+    return student_data, grades_part1, grades_part2, summary_data
+
+@bp.route('/generate_report', methods=['GET', 'POST'])
+@login_required
+def generate_report():
+    # Synchronous download, kept for clients without JavaScript; the student page uses /bulletin_jobs
+    if current_user.role != 'student':
+        flash('Access denied', 'danger')
+        return redirect(url_for('main.index'))
     
-    # Create a temporary file for the PDF
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        pdf_path = temp_file.name
-        # CALL THE NEW FUNCTION with the new data structure
-        generate_bulletin_pdf(pdf_path, student_data, grades_part1, grades_part2, summary_data)
-        
+    requested_period = request.args.get('period') or get_default_bulletin_period(current_user.id)
+    generation = bulletin_cache.generation(current_user.id)
+    student_data, grades_part1, grades_part2, summary_data = build_student_bulletin(current_user, requested_period)
+    return send_cached_bulletin(
+        current_user.id, generation, student_data, grades_part1, grades_part2, summary_data,
+        f'report_card_{current_user.username}.pdf',
+        'main.student_interface'
+    )
+
+# Background rendering of bulletins. The request only gathers the bulletin data (a few indexed queries) and
+# enqueues the ReportLab rendering on a small thread pool, so HTTP workers are not tied up while a PDF renders.
+# Job state lives in the BulletinJob table, the rendered PDF in the bulletin cache.
+def run_bulletin_job(app, job_id, generation, bulletin):
+    with app.app_context():
+        job = db.session.get(BulletinJob, job_id)
+        job.status = 'running'
+        db.session.commit()
         try:
-            response = send_file(
-                pdf_path,
-                as_attachment=True,
-                download_name=f'report_card_{current_user.username}.pdf'
-            )
-            # Delete the file after it's been sent
-            @response.call_on_close
-            def cleanup():
-                try:
-                    os.remove(pdf_path)
-                except Exception as e:
-                    app.logger.error(f"Error deleting temporary PDF file: {e}")
-            return response
+            buffer = io.BytesIO()
+            with pdf_render_timer('bulletin_job'):
+                render_bulletin_pdf(buffer, *bulletin)
+            bulletin_cache.put(job.student_id, job.cache_key, buffer.getvalue(), generation)
+            job.status = 'done'
         except Exception as e:
-            # Clean up in case of error
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
-            app.logger.error(f"Error generating or sending report card for {current_user.username}: {e}", exc_info=True)
-            flash(f'Error generating report card. Please contact support. Error: {e}', 'danger')
-            return redirect(url_for('student_interface'))
+            current_app.logger.error(f"Bulletin job {job_id} failed: {e}", exc_info=True)
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+def bulletin_job_to_dict(job):
+    # Jobs stuck in queued/running for too long were lost (e.g. the server restarted), report them as failed
+    lost = job.status in ('queued', 'running') and datetime.utcnow() - job.created_at > BULLETIN_JOB_TIMEOUT
+    data = {
+        'job_id': job.id,
+        'period': job.period,
+        'status': 'failed' if lost else job.status,
+        'error': 'The job was interrupted, please try again.' if lost else job.error,
+        'status_url': url_for('main.bulletin_job_status', job_id=job.id)
+    }
+    if job.status == 'done':
+        data['download_url'] = url_for('main.download_bulletin_job', job_id=job.id)
+    return data
+
+def get_own_bulletin_job(job_id):
+    job = db.session.get(BulletinJob, job_id)
+    if not job or (current_user.role != 'teacher' and job.student_id != current_user.id):
+        return None
+    return job
+
+@bp.route('/bulletin_jobs', methods=['POST'])
+@login_required
+def submit_bulletin_job():
+    if current_user.role != 'student':
+        return {'error': 'Access denied'}, 403
+
+    data = request.get_json(silent=True) or {}
+    requested_period = data.get('period') or request.form.get('period') or get_default_bulletin_period(current_user.id)
+    generation = bulletin_cache.generation(current_user.id)
+    bulletin = build_student_bulletin(current_user, requested_period)
+    cache_key = bulletin_cache.make_key(*bulletin)
+
+    # Reuse a pending or finished job for the same content instead of rendering it again
+    job = BulletinJob.query.filter(
+        BulletinJob.student_id == current_user.id,
+        BulletinJob.cache_key == cache_key,
+        BulletinJob.status.in_(('queued', 'running', 'done')),
+        BulletinJob.created_at > datetime.utcnow() - BULLETIN_JOB_TIMEOUT
+    ).order_by(BulletinJob.created_at.desc()).first()
+    if job and (job.status != 'done' or bulletin_cache.get(current_user.id, cache_key)):
+        return bulletin_job_to_dict(job), 202
+
+    already_rendered = bulletin_cache.get(current_user.id, cache_key) is not None
+    job = BulletinJob(id=uuid.uuid4().hex, student_id=current_user.id, period=requested_period, cache_key=cache_key,
+                      status='done' if already_rendered else 'queued',
+                      finished_at=datetime.utcnow() if already_rendered else None)
+    db.session.add(job)
+    # Forget old jobs, their PDFs stay available through the bulletin cache
+    BulletinJob.query.filter(BulletinJob.created_at < datetime.utcnow() - BULLETIN_JOB_RETENTION).delete(synchronize_session=False)
+    db.session.commit()
+    if not already_rendered:
+        bulletin_job_executor.submit(run_bulletin_job, current_app._get_current_object(), job.id, generation, bulletin)
+    return bulletin_job_to_dict(job), 202
+
+@bp.route('/bulletin_jobs/<job_id>')
+@login_required
+def bulletin_job_status(job_id):
+    job = get_own_bulletin_job(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return bulletin_job_to_dict(job), 200
+
+@bp.route('/bulletin_jobs/<job_id>/download')
+@login_required
+def download_bulletin_job(job_id):
+    job = get_own_bulletin_job(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    if job.status != 'done':
+        return {'error': 'The bulletin is not ready yet.', **bulletin_job_to_dict(job)}, 409
+    pdf_path = bulletin_cache.get(job.student_id, job.cache_key)
+    if not pdf_path: # Grades changed since the job ran (or the file was evicted)
+        return {'error': 'This bulletin is out of date, please generate it again.'}, 410
+    student = db.session.get(User, job.student_id)
+    return send_file(pdf_path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'report_card_{student.username}.pdf')
+
+# Grade rows of one period for the statistics engine, grouped by class (school_class_id -> rows).
+# Only the needed columns are loaded, without building ORM objects. Grades linked to a subject of their class's
+# structure are grouped by that Subject, the others by their own subject name.
+def load_period_grade_rows(period, school_class_id=None):
+    query = db.session.query(
+        User.current_class_id, Grade.student_id, func.coalesce(Subject.name, Grade.subject), Grade.moy_cl, Grade.n_compo, Grade.coef
+    ).join(User, Grade.student_id == User.id).outerjoin(Subject, Grade.subject_id == Subject.id).filter(
+        User.role == 'student',
+        User.current_class_id.isnot(None),
+        Grade.period == period
+    )
+    if school_class_id is not None:
+        query = query.filter(User.current_class_id == school_class_id)
+    rows_by_class = {}
+    for class_id, *row in query.order_by(Grade.id):
+        rows_by_class.setdefault(class_id, []).append(row)
+    return rows_by_class
+
+# Statistics of every class (or one class) for a period, see class_stats.py
+def get_period_statistics(period, school_class_id=None):
+    from class_stats import compute_class_statistics # NumPy is only imported when statistics are first needed
+    rows_by_class = load_period_grade_rows(period, school_class_id)
+    class_names = dict(db.session.query(SchoolClass.id, SchoolClass.name).filter(SchoolClass.id.in_(list(rows_by_class))))
+    return [
+        {'class_id': class_id, 'class_name': class_names.get(class_id), 'period': period, **compute_class_statistics(rows)}
+        for class_id, rows in sorted(rows_by_class.items(), key=lambda item: class_names.get(item[0]) or '')
+    ]
+
+@bp.route('/api/class_statistics')
+@login_required
+def api_class_statistics():
+    # Per-subject and per-student statistics of a period, for all classes or only ?class_id=
+    if current_user.role != 'teacher':
+        return {'error': 'Access denied'}, 403
+    period = request.args.get('period')
+    if not period:
+        return {'error': 'Period is required.'}, 400
+    return {'period': period, 'classes': get_period_statistics(period, request.args.get('class_id', type=int))}, 200
+
+@bp.route('/generate_class_reports', methods=['GET'])
+@login_required
+def generate_class_reports():
+    if current_user.role != 'teacher':
+        flash('Access denied', 'danger')
+        return redirect(url_for('main.index'))
+
+    class_id = request.args.get('class_id', type=int)
+    requested_period = request.args.get('period')
+    school_class = db.session.get(SchoolClass, class_id) if class_id else None
+    if not school_class or not requested_period:
+        flash('Please select a class and a period to generate the class bulletins.', 'danger')
+        return redirect(url_for('main.teacher_interface'))
+
+    students = User.query.filter_by(current_class_id=school_class.id, role='student').order_by(User.username).all()
+
+    # Load every grade of the class for this period in a single query
+    class_grades = Grade.query.join(User, Grade.student_id == User.id).filter(
+        User.current_class_id == school_class.id,
+        User.role == 'student',
+        Grade.period == requested_period
+    ).order_by(Grade.subject).all()
+
+    grades_by_student = {}
+    for g in class_grades:
+        grades_by_student.setdefault(g.student_id, []).append((grade_subject_key(g), format_grade_for_pdf(g)))
+
+    if not grades_by_student:
+        flash(f'No grades found for class "{school_class.name}" in {requested_period}.', 'warning')
+        return redirect(url_for('main.teacher_interface', class_name=school_class.name))
+
+    # Rank the whole class once (only students with grades in this period are ranked)
+    rankings = {r['student_id']: r for r in get_class_rankings(school_class.id, requested_period)}
+    rank_1_moy_val = format_average(next(iter(rankings.values()))['top_average']) if rankings else "N/A"
+
+    subjects_part1, subjects_part2 = get_bulletin_subjects(school_class.id)
+    period_averages = get_period_averages(grades_by_student.keys())
+
+    bulletins = []
+    for student in students:
+        if student.id not in grades_by_student:
+            continue
+        grades_part1, grades_part2 = split_grades_for_bulletin(grades_by_student[student.id], subjects_part1, subjects_part2)
+        ranking = rankings.get(student.id)
+        current_rank = format_rank(ranking['rank'], ranking['tied_count'] > 1) if ranking else "N/A"
+        summary_data = build_summary_data(grades_part1, grades_part2, current_rank, rank_1_moy_val,
+                                          period_averages[student.id], requested_period)
+        student_data = build_student_data(student.username, school_class.name, requested_period)
+        bulletins.append((student_data, grades_part1, grades_part2, summary_data))
+
+    return send_generated_pdf(
+        lambda buffer: render_class_bulletins_pdf(buffer, bulletins),
+        'class',
+        f'bulletins_{school_class.name}_{requested_period}.pdf'.replace(' ', '_'),
+        'main.teacher_interface'
+    )
+
 
 # School Class Management Routes
-@app.route('/manage_school_classes')
+@bp.route('/manage_school_classes')
 @login_required
 def manage_school_classes():
     if current_user.role != 'teacher': # Or a new 'admin' role later
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     classes = SchoolClass.query.order_by(SchoolClass.name).all()
     return render_template('manage_school_classes.html', classes=classes)
 
-@app.route('/add_school_class', methods=['POST'])
+@bp.route('/add_school_class', methods=['POST'])
 @login_required
 def add_school_class():
     if current_user.role != 'teacher':
         flash('Access denied', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     class_name = request.form.get('class_name', '').strip()
     if not class_name:
         flash('Class name is required.', 'danger')
-        return redirect(url_for('manage_school_classes'))
+        return redirect(url_for('main.manage_school_classes'))
     
     existing_class = SchoolClass.query.filter_by(name=class_name).first()
     if existing_class:
@@ -719,7 +1727,7 @@ def add_school_class():
         db.session.add(new_class)
         db.session.commit()
         flash(f'Class "{class_name}" added successfully!', 'success')
-    return redirect(url_for('manage_school_classes'))
+    return redirect(url_for('main.manage_school_classes'))
 
 def create_default_school_classes():
     default_classes = [
@@ -734,54 +1742,209 @@ def create_default_school_classes():
     db.session.commit()
 
 # Placeholder route, to be implemented later
-@app.route('/assign_students_to_class/<int:class_id>')
+@bp.route('/assign_students_to_class/<int:class_id>')
 @login_required
 def assign_students_to_class_interface(class_id):
     # TODO: Implement student assignment to class interface
     flash(f'Student assignment interface for class ID {class_id} is not yet implemented.', 'info')
-    return redirect(url_for('manage_school_classes'))
+    return redirect(url_for('main.manage_school_classes'))
+
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and apply pending schema migrations (see migrations.py)."""
+    applied = upgrade_database(db)
+    for version, description in applied:
+        print(f"Applied migration {version}: {description}")
+    if not applied:
+        print("Database schema is up to date.")
+
+@bp.cli.command('query-plans')
+def query_plans_command():
+    """Print the SQLite query plans of the hot query paths, to check that they use indexes."""
+    sample_class_id = 1
+    sample_period = STANDARD_PERIODS[0]
+    hot_queries = {
+        'bulletin grades of a student (generate_report)':
+            Grade.query.filter_by(student_id=1, period=sample_period).order_by(Grade.subject),
+        'students of a class (teacher_interface)':
+            User.query.filter_by(current_class_id=sample_class_id, role='student').order_by(User.username),
+        'grade page, all classes (teacher_interface, /api/grades)':
+            Grade.query.join(User, Grade.student_id == User.id)
+                .order_by(Grade.date.desc(), Grade.id.desc()).limit(GRADES_PAGE_SIZE + 1),
+        'grade page of a class (teacher_interface, /api/grades)':
+            Grade.query.join(User, Grade.student_id == User.id).filter(User.current_class_id == sample_class_id)
+                .order_by(Grade.date.desc(), Grade.id.desc()).limit(GRADES_PAGE_SIZE + 1),
+        'grades of a class for a period (generate_class_reports)':
+            Grade.query.join(User, Grade.student_id == User.id).filter(
+                User.current_class_id == sample_class_id, User.role == 'student', Grade.period == sample_period),
+        'class ranking (get_student_rank)':
+            db.session.query(_class_ranking_subquery(sample_class_id, sample_period)),
+    }
+    for name, query in hot_queries.items():
+        print(f"-- {name}")
+        try:
+            for line in explain_query_plan(db, query):
+                print(f"   {line}")
+        except OperationalError as e: # e.g. a table created by a pending migration
+            print(f"   ERROR: {e.orig} (run `flask upgrade-db` first)")
+
+@bp.cli.command('storage-info')
+def storage_info_command():
+    """Print the storage mode, the engine pool and the SQLite pragmas in effect."""
+    print(f"Storage mode: {get_storage_mode(current_app)}")
+    print(f"Database: {db.engine.url}")
+    print(f"Pool: {db.engine.pool.status()}")
+    with db.engine.connect() as connection:
+        for name, value in read_storage_pragmas(connection).items():
+            print(f"  PRAGMA {name} = {value}")
+
+@bp.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Rebuild the GradeSummary table from the Grade table (backfill or repair drift)."""
+    count = rebuild_grade_summaries()
+    db.session.commit()
+    publish_cache_invalidation('period_averages')
+    print(f"Rebuilt {count} grade summaries.")
+
+@bp.cli.command('seed-school')
+@click.option('--classes', 'class_count', default=8, show_default=True, help='Number of classes to create.')
+@click.option('--students', 'students_per_class', default=40, show_default=True, help='Students per class.')
+@click.option('--subjects', 'subject_count', default=12, show_default=True, help='Subjects per bulletin structure.')
+@click.option('--prefix', default='Classe', show_default=True, help='Classes are named "<prefix> 1", "<prefix> 2"...')
+@click.option('--password', default='password123', show_default=True, help='Password of every generated account.')
+@click.option('--seed', default=0, show_default=True, help='Random seed of the generated grades.')
+def seed_school_command(class_count, students_per_class, subject_count, prefix, password, seed):
+    """Generate a synthetic school: classes with a bulletin structure, a teacher, students and grades for every period."""
+    class_names = [f'{prefix} {n}' for n in range(1, class_count + 1)]
+    existing = [name for (name,) in db.session.query(SchoolClass.name).filter(SchoolClass.name.in_(class_names))]
+    if existing:
+        raise click.ClickException(f"Classes already exist: {', '.join(existing)} (use another --prefix)")
+
+    started = time.perf_counter()
+    class_ids = generate_school(db, [(name, students_per_class) for name in class_names], STANDARD_PERIODS, subject_count,
+                                generate_password_hash(password), random.Random(seed))
+    for class_id in class_ids:
+        rebuild_grade_summaries(class_id)
+    db.session.commit()
+    invalidate_structure_cache()
+    publish_cache_invalidation('structures') # Running servers may have cached the new classes as having no structure
+
+    grade_count = class_count * students_per_class * subject_count * len(STANDARD_PERIODS)
+    print(f"Created {class_count} classes, {class_count * students_per_class} students and {grade_count} grades "
+          f"in {time.perf_counter() - started:.1f} s.")
+    print(f"Accounts (password {password!r}): students {class_username_prefix(class_names[0])}_000..., "
+          f"teachers {class_username_prefix(class_names[0])}_teacher...")
+
+@bp.cli.command('profile-stats')
+@click.argument('profile_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--sort', default='cumulative', show_default=True, help='pstats sort key: cumulative, tottime, calls...')
+@click.option('--limit', default=30, show_default=True, help='Number of functions to print.')
+def profile_stats_command(profile_file, sort, limit):
+    """Print the most expensive functions of a request profile written by the profiler (see profiling.py)."""
+    pstats.Stats(profile_file).strip_dirs().sort_stats(sort).print_stats(limit)
+
+@bp.cli.command('class-stats')
+@click.argument('period')
+def class_stats_command(period):
+    """Print the per-subject statistics of every class for a period (class council summary)."""
+    for stats in get_period_statistics(period):
+        print(f"== {stats['class_name']} ({stats['student_count']} students) - class average {stats['class']['mean']:.2f}, "
+              f"Moy. du 1er {stats['class']['top_average']:.2f}, pass rate {stats['class']['pass_rate']:.0f}%")
+        print(f"   {'Subject':<20} {'Mean':>6} {'Min':>6} {'Max':>6} {'Std':>6} {'Median':>6} {'Pass%':>6}")
+        for subject in stats['subjects']:
+            print(f"   {subject['subject']:<20} {subject['mean']:>6.2f} {subject['min']:>6.2f} {subject['max']:>6.2f} "
+                  f"{subject['std']:>6.2f} {subject['p50']:>6.2f} {subject['pass_rate']:>6.0f}")
+
+# Default data of a new installation: the teacher account, the school classes and two bulletin structures
+def seed_default_data():
+    # Create default teacher account if it doesn't exist
+    if not User.query.filter_by(username='teacher').first():
+        teacher = User(
+            username='teacher',
+            password=generate_password_hash('password123'),
+            role='teacher'
+        )
+        db.session.add(teacher)
+    
+    # Add some default bulletin structures if they don't exist
+    default_structures_data = [
+        {
+            'class_name_to_find': 'Terminale C', 
+            'subjects_part1': 'MATHS,PHYSIQUE,CHIMIE,PHILOSOPHIE,ANGLAIS,SVT',
+            'subjects_part2': 'E.C.M,EPS,INFORMATIQUE,CONDUITE'
+        },
+        {
+            'class_name_to_find': 'Seconde A',
+            'subjects_part1': 'MATHS,FRANCAIS,ANGLAIS,HIST-GEO,PHYSIQUE-CHIMIE,SVT',
+            'subjects_part2': 'E.C.M,EPS,LV2,ART PLASTIQUE'
+        }
+    ]
+    for struct_data in default_structures_data:
+        school_class_obj = SchoolClass.query.filter_by(name=struct_data['class_name_to_find']).first()
+        if school_class_obj:
+            if not BulletinStructure.query.filter_by(school_class_id=school_class_obj.id).first():
+                new_struct = BulletinStructure(school_class_id=school_class_obj.id)
+                set_structure_subjects(new_struct, struct_data['subjects_part1'], struct_data['subjects_part2'])
+                db.session.add(new_struct)
+        else:
+            current_app.logger.warning(f"Default bulletin structure: Class '{struct_data['class_name_to_find']}' not found in SchoolClass table. Structure not created.")
+    
+    create_default_school_classes() # Call the function to create default classes
 
-if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        
-        # Create default teacher account if it doesn't exist
-        if not User.query.filter_by(username='teacher').first():
-            teacher = User(
-                username='teacher',
-                password=generate_password_hash('password123'),
-                role='teacher'
-            )
-            db.session.add(teacher)
-        
-        # Add some default bulletin structures if they don't exist
-        default_structures_data = [
-            {
-                'class_name_to_find': 'Terminale C', 
-                'subjects_part1': 'MATHS,PHYSIQUE,CHIMIE,PHILOSOPHIE,ANGLAIS,SVT',
-                'subjects_part2': 'E.C.M,EPS,INFORMATIQUE,CONDUITE'
-            },
-            {
-                'class_name_to_find': 'Seconde A',
-                'subjects_part1': 'MATHS,FRANCAIS,ANGLAIS,HIST-GEO,PHYSIQUE-CHIMIE,SVT',
-                'subjects_part2': 'E.C.M,EPS,LV2,ART PLASTIQUE'
-            }
-        ]
-        for struct_data in default_structures_data:
-            school_class_obj = SchoolClass.query.filter_by(name=struct_data['class_name_to_find']).first()
-            if school_class_obj:
-                if not BulletinStructure.query.filter_by(school_class_id=school_class_obj.id).first():
-                    new_struct = BulletinStructure(
-                        school_class_id=school_class_obj.id,
-                        subjects_part1=struct_data['subjects_part1'],
-                        subjects_part2=struct_data['subjects_part2']
-                    )
-                    db.session.add(new_struct)
-            else:
-                app.logger.warning(f"Default bulletin structure: Class '{struct_data['class_name_to_find']}' not found in SchoolClass table. Structure not created.")
-        
-        create_default_school_classes() # Call the function to create default classes
-        
-        db.session.commit() # Commit all pending changes (teacher, structures, classes)
+    # Backfill grade summaries for databases created before the GradeSummary table existed
+    if not GradeSummary.query.first() and Grade.query.first():
+        rebuild_grade_summaries()
     
-    app.run(debug=True)
+    db.session.commit() # Commit all pending changes (teacher, structures, classes)
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database, then add the default teacher, classes and bulletin structures."""
+    for version, description in upgrade_database(db):
+        print(f"Applied migration {version}: {description}")
+    seed_default_data()
+    print("Database initialized.")
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key')  # Change this in production
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///school.db')
+    app.config['STORAGE_MODE'] = os.environ.get('STORAGE_MODE', DEFAULT_STORAGE_MODE) # See storage.py
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['BULLETIN_CACHE_DIR'] = os.environ.get('BULLETIN_CACHE_DIR', os.path.join(app.instance_path, 'bulletin_cache'))
+    app.config['BULLETIN_CACHE_MAX_BYTES'] = int(os.environ.get('BULLETIN_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    # Smaller bulletin PDFs that look the same (see generate_bulletin_pdf), for downloads over mobile data
+    app.config['BULLETIN_PDF_COMPACT'] = os.environ.get('BULLETIN_PDF_COMPACT', '0') == '1'
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60)) # Seconds, 0 disables the cache of logged-in users (see load_user)
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    app.config['BULLETIN_JOB_WORKERS'] = int(os.environ.get('BULLETIN_JOB_WORKERS', 2)) # Threads rendering bulletins in the background
+    app.config['SQL_QUERY_BUDGET'] = int(os.environ.get('SQL_QUERY_BUDGET', 0)) # Log requests issuing more SQL statements, 0 disables (see metrics.py)
+    # Request profiler, off unless one of the first two is set (see profiling.py)
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_USERS'] = os.environ.get('PROFILE_USERS', '')
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.update(config or {})
+
+    configure_storage(app)
+    db.init_app(app)
+    with app.app_context():
+        install_storage_pragmas(db.engine, get_storage_mode(app))
+        install_metrics(app, db.engine)
+    app.extensions['bulletin_cache'] = BulletinCache(app.config['BULLETIN_CACHE_DIR'], app.config['BULLETIN_CACHE_MAX_BYTES'])
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    # Threads are only started by the first job, so a preloaded app can be forked safely
+    app.extensions['bulletin_job_executor'] = ThreadPoolExecutor(max_workers=app.config['BULLETIN_JOB_WORKERS'], thread_name_prefix='bulletin-job')
+    login_manager.init_app(app)
+    login_manager.login_view = 'main.login'
+    install_profiler(app)
+    app.register_blueprint(bp)
+
+    # The structure and period average caches are per process: drop what another app (database) may have cached
+    invalidate_structure_cache()
+    invalidate_period_averages()
+    return app
+
+if __name__ == '__main__':
+    # Development server only (single process, debugger on). Create the database first with `flask init-db`;
+    # in production, serve wsgi.py with gunicorn (gunicorn.conf.py) or waitress
+    create_app().run(debug=True)
@@ -0,0 +1,16 @@
+"""Synthetic classes for the benchmarks: realistic class sizes with a full bulletin structure and grades."""
+import random
+
+from werkzeug.security import generate_password_hash
+
+from seeding import generate_school # The repository root is on sys.path, see hot_paths.py
+
+def create_class(app_module, name, student_count, period, subject_count=12, rng=None):
+    """Create a class of student_count students with one grade per subject for the period (see seeding.py).
+    Returns the id of the class."""
+    db = app_module.db
+    password = generate_password_hash('password123') # Hashing is slow, every account shares one hash
+    (class_id,) = generate_school(db, [(name, student_count)], [period], subject_count, password, rng or random.Random(0))
+    app_module.rebuild_grade_summaries(class_id)
+    db.session.commit()
+    return class_id
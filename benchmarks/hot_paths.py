@@ -0,0 +1,216 @@
+"""Micro-benchmarks of the bulletin and grading hot paths, on classes of realistic sizes.
+
+For each class size (30, 60 and 120 students by default, 12 subjects), in a fresh temporary database:
+  build_bulletin[N]     building one student's bulletin data (grades, structure, rank, period averages)
+  render_bulletin[N]    rendering one bulletin PDF
+  class_pdf[N]          rendering the class's bulletins into one PDF, per bulletin
+  render_bulletin_compact[N], class_pdf_compact[N]
+                        the same in the compact output mode (see generate_bulletin_pdf)
+  class_ranking[N]      ranking the class (SQL window functions)
+  class_statistics[N]   the class statistics (NumPy)
+  dashboard_query[N]    the first page of the class's grades on the teacher dashboard
+  dashboard_page[N]     the whole teacher dashboard request
+
+The size of the bulletins, in bytes per bulletin, is reported for both output modes.
+
+Results are written as JSON (milliseconds, per operation). Pass a previous result file with --compare to
+print the change of each median and exit with status 1 if one regressed by more than --threshold.
+
+    python benchmarks/hot_paths.py [--sizes 30 60 120] [--subjects 12] [--repeat 20] [--output FILE] [--compare BASELINE]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+PERIOD = '1ère Période'
+RESULT_FORMAT = 1
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def measure_each(fn, items):
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def summarize(samples, per=1):
+    samples = [sample / per for sample in samples]
+    return {
+        'unit': 'ms',
+        'samples': len(samples),
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'max': max(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def render_size(render):
+    buffer = io.BytesIO()
+    render(buffer)
+    return len(buffer.getvalue())
+
+def run_benchmarks(args, db_path):
+    sys.path.insert(0, REPO_ROOT)
+    import app as app_module
+    from pdf_generator import generate_bulletin_pdf, generate_class_bulletins_pdf
+    from fixtures import create_class
+    app, db = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'}), app_module.db
+    results = {}
+    sizes = {}
+
+    with app.app_context():
+        app_module.upgrade_database(db)
+        teacher = app_module.User(username='bench_teacher', password='-', role='teacher')
+        db.session.add(teacher)
+        db.session.commit()
+        teacher_id = teacher.id
+        rng = random.Random(args.seed)
+        classes = [(size, create_class(app_module, f'Bench {size}', size, PERIOD, args.subjects, rng)) for size in args.sizes]
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(teacher_id) # Logged in as the teacher, see Flask-Login
+
+    for size, class_id in classes:
+        print(f'{size} students...', file=sys.stderr)
+        with app.app_context():
+            school_class = db.session.get(app_module.SchoolClass, class_id)
+            students = app_module.User.query.filter_by(current_class_id=class_id, role='student').order_by(app_module.User.username).all()
+            build = lambda student: app_module.build_student_bulletin(student, PERIOD)
+            build(students[0]) # Warm-up: structure and period average caches
+            results[f'build_bulletin[{size}]'] = summarize(measure_each(build, students))
+
+            bulletins = [build(student) for student in students]
+            render = lambda bulletin: generate_bulletin_pdf(io.BytesIO(), *bulletin)
+            render(bulletins[0]) # Warm-up: fonts and bulletin template
+            results[f'render_bulletin[{size}]'] = summarize(measure_each(render, bulletins))
+            results[f'class_pdf[{size}]'] = summarize(
+                measure(lambda: generate_class_bulletins_pdf(io.BytesIO(), bulletins), args.class_pdf_repeat, warmup=0), per=len(bulletins))
+            render_compact = lambda bulletin: generate_bulletin_pdf(io.BytesIO(), *bulletin, compact=True)
+            results[f'render_bulletin_compact[{size}]'] = summarize(measure_each(render_compact, bulletins))
+            results[f'class_pdf_compact[{size}]'] = summarize(
+                measure(lambda: generate_class_bulletins_pdf(io.BytesIO(), bulletins, compact=True), args.class_pdf_repeat, warmup=0), per=len(bulletins))
+
+            for compact, suffix in ((False, ''), (True, '_compact')):
+                sizes[f'bulletin_bytes{suffix}[{size}]'] = statistics.median(
+                    render_size(lambda buffer: generate_bulletin_pdf(buffer, *bulletin, compact=compact)) for bulletin in bulletins)
+                sizes[f'class_pdf_bytes{suffix}[{size}]'] = render_size(
+                    lambda buffer: generate_class_bulletins_pdf(buffer, bulletins, compact=compact)) / len(bulletins)
+
+            results[f'class_ranking[{size}]'] = summarize(measure(lambda: app_module.get_class_rankings(class_id, PERIOD), args.repeat))
+            results[f'class_statistics[{size}]'] = summarize(measure(lambda: app_module.get_period_statistics(PERIOD, class_id), args.repeat))
+            results[f'dashboard_query[{size}]'] = summarize(measure(lambda: app_module.query_grades_page(class_id), args.repeat))
+            class_name = school_class.name
+
+        def dashboard_page():
+            response = client.get('/teacher', query_string={'class_name': class_name})
+            assert response.status_code == 200, response.status_code
+        results[f'dashboard_page[{size}]'] = summarize(measure(dashboard_page, args.repeat))
+
+    return results, sizes
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"{'benchmark':<30} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, result in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            print(f"{name:<30} {'-':>11} {result['median']:>8.2f} ms {'new':>8}")
+            continue
+        change = result['median'] / previous['median'] - 1 if previous['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<30} {previous['median']:>8.2f} ms {result['median']:>8.2f} ms {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 60, 120], help='students per class')
+    parser.add_argument('--subjects', type=int, default=12, help='subjects per class')
+    parser.add_argument('--repeat', type=int, default=20, help='runs of the class-level benchmarks')
+    parser.add_argument('--class-pdf-repeat', type=int, default=3, help='runs of the class PDF benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated grades')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/hot_paths-<date>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='previous result file to compare the medians with')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative slowdown counted as a regression')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        benchmarks, sizes = run_benchmarks(args, os.path.join(temp_dir, 'bench.db'))
+    results = {
+        'format': RESULT_FORMAT,
+        'metadata': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'subjects': args.subjects,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'benchmarks': benchmarks,
+        'sizes': sizes, # Bytes per bulletin
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"hot_paths-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        print(f"{'benchmark':<30} {'median':>11} {'min':>11}")
+        for name, result in benchmarks.items():
+            print(f"{name:<30} {result['median']:>8.2f} ms {result['min']:>8.2f} ms")
+
+    print(f"{'bytes per bulletin':<30} {'baseline':>11} {'current':>11}")
+    baseline_sizes = baseline.get('sizes', {}) if args.compare else {}
+    for name, value in sizes.items():
+        previous = baseline_sizes.get(name)
+        previous_text = f'{previous:.0f}' if previous is not None else '-'
+        print(f"{name:<30} {previous_text:>11} {value:>11.0f}")
+
+    # Only now that the whole report is printed
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""HTTP load test of a running server, with the accounts generated by `flask seed-school`.
+
+Virtual users run concurrently until the duration is over, each one in a loop of sessions:
+  teacher: login, then dashboard views of their class and grade writes (/add_grade)
+  student: login, then student page views and bulletin downloads (/generate_report)
+Prints the latency percentiles and throughput of each kind of request.
+
+    flask seed-school --classes 8 --students 40
+    flask run   # or gunicorn, in another terminal
+    python benchmarks/load_test.py [--url http://127.0.0.1:5000] [--users 16] [--seconds 30] [--db instance/school.db]
+
+The accounts are read from the database file (classes named "<prefix> N"), so run it on the same machine.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from seeding import class_username_prefix
+
+PERIODS = ["1ère Période", "2e Période", "3e Période"]
+PERCENTILES = (50, 90, 95, 99)
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirects (after a login or a grade write) are reported as is, the next request is the scenario's choice
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+def load_accounts(db_path, prefix):
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute(
+        'SELECT school_class.name, user.id, user.username FROM user JOIN school_class ON school_class.id = user.current_class_id '
+        "WHERE user.role = 'student' AND school_class.name LIKE ? ORDER BY user.id", (f'{prefix} %',)
+    ).fetchall()
+    connection.close()
+    classes = {}
+    for class_name, student_id, username in rows:
+        classes.setdefault(class_name, []).append((student_id, username))
+    return classes
+
+class VirtualUser:
+    def __init__(self, base_url, password, record):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self.record = record
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+
+    def request(self, name, path, data=None, expected=(200,)):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e: # Including the 302 of NoRedirect
+            e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = None
+        self.record(name, time.perf_counter() - started, status in expected)
+
+    def login(self, username):
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+        self.request('login', '/login', {'username': username, 'password': self.password}, expected=(302,))
+
+def teacher_session(user, class_name, students, rng, actions):
+    user.login(f'{class_username_prefix(class_name)}_teacher')
+    for _ in range(actions):
+        if rng.random() < 0.5:
+            user.request('dashboard', '/teacher?' + urllib.parse.urlencode({'class_name': class_name}))
+        else:
+            student_id, _username = rng.choice(students)
+            user.request('add_grade', '/add_grade', {
+                'student_id': student_id, 'subject': 'MATHS', 'period': rng.choice(PERIODS),
+                'moy_cl': round(rng.uniform(5, 20), 2), 'n_compo': round(rng.uniform(5, 20), 2), 'coef': rng.randint(1, 5),
+                'selected_class_for_grade': class_name
+            }, expected=(302,))
+
+def student_session(user, students, rng, actions):
+    _student_id, username = rng.choice(students)
+    user.login(username)
+    for _ in range(actions):
+        if rng.random() < 0.5:
+            user.request('student_page', '/student')
+        else:
+            user.request('generate_report', '/generate_report?' + urllib.parse.urlencode({'period': rng.choice(PERIODS)}))
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--db', default=os.path.join(REPO_ROOT, 'instance', 'school.db'), help='database file of the server')
+    parser.add_argument('--prefix', default='Classe', help='--prefix given to flask seed-school')
+    parser.add_argument('--password', default='password123', help='--password given to flask seed-school')
+    parser.add_argument('--users', type=int, default=16, help='concurrent virtual users')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--teacher-ratio', type=float, default=0.25, help='share of teacher sessions')
+    parser.add_argument('--actions', type=int, default=10, help='requests per session after the login')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    classes = load_accounts(args.db, args.prefix)
+    if not classes:
+        sys.exit(f'No class named "{args.prefix} N" in {args.db}, run `flask seed-school` first.')
+
+    latencies = {}
+    failures = {}
+    lock = threading.Lock()
+    def record(name, elapsed, ok):
+        with lock:
+            latencies.setdefault(name, []).append(elapsed)
+            failures[name] = failures.get(name, 0) + (not ok)
+
+    deadline = time.perf_counter() + args.seconds
+    def run(index):
+        rng = random.Random(args.seed * 1000 + index)
+        user = VirtualUser(args.url, args.password, record)
+        while time.perf_counter() < deadline:
+            class_name = rng.choice(sorted(classes))
+            if rng.random() < args.teacher_ratio:
+                teacher_session(user, class_name, classes[class_name], rng, args.actions)
+            else:
+                student_session(user, classes[class_name], rng, args.actions)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {'url': args.url, 'users': args.users, 'seconds': elapsed, 'requests': {}}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        results['requests'][name] = {
+            'count': len(values),
+            'failures': failures[name],
+            'per_s': len(values) / elapsed,
+            'mean_ms': statistics.fmean(values) * 1000,
+            **{f'p{q}_ms': percentile(values, q) * 1000 for q in PERCENTILES},
+            'max_ms': values[-1] * 1000,
+        }
+    total = sum(result['count'] for result in results['requests'].values())
+    results['total'] = {'count': total, 'failures': sum(failures.values()), 'per_s': total / elapsed}
+
+    print(f"{args.users} users, {elapsed:.1f} s against {args.url}")
+    print(f"{'request':<16} {'count':>7} {'fail':>5} {'req/s':>7} " + ' '.join(f"{f'p{q}':>8}" for q in PERCENTILES) + f" {'max':>8}")
+    for name, result in results['requests'].items():
+        print(f"{name:<16} {result['count']:>7} {result['failures']:>5} {result['per_s']:>7.1f} "
+              + ' '.join(f"{result[f'p{q}_ms']:>6.0f}ms" for q in PERCENTILES) + f" {result['max_ms']:>6.0f}ms")
+    print(f"{'total':<16} {total:>7} {results['total']['failures']:>5} {results['total']['per_s']:>7.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Concurrent read/write stress test of the SQLite storage modes (see storage.py).
+
+Runs the same workload against a fresh database in each STORAGE_MODE: teachers saving grades (the
+add_grade transaction: insert + GradeSummary update + commit) while students read bulletin data (class
+ranking and a page of grades). Prints the throughput and the "database is locked" errors of each mode.
+
+    python benchmarks/sqlite_concurrency.py [--writers 4] [--readers 8] [--seconds 10] [--modes default concurrent]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERIOD = '1ère Période'
+SUBJECTS = ['MATHS', 'PHYSIQUE', 'CHIMIE', 'SVT', 'PHILOSOPHIE', 'ANGLAIS', 'FRANCAIS', 'HIST-GEO', 'EPS', 'E.C.M']
+
+def seed(app_module, app, student_count):
+    from werkzeug.security import generate_password_hash
+    db = app_module.db
+    with app.app_context():
+        app_module.upgrade_database(db)
+        school_class = app_module.SchoolClass(name='Terminale C')
+        db.session.add(school_class)
+        db.session.flush()
+        structure = app_module.BulletinStructure(school_class_id=school_class.id)
+        app_module.set_structure_subjects(structure, ','.join(SUBJECTS[:6]), ','.join(SUBJECTS[6:]))
+        db.session.add(structure)
+        password = generate_password_hash('password123')
+        students = [app_module.User(username=f'bench_student_{i}', password=password, role='student', current_class_id=school_class.id)
+                    for i in range(student_count)]
+        db.session.add_all(students)
+        db.session.flush()
+        for student in students:
+            for subject in SUBJECTS:
+                db.session.add(app_module.Grade(student_id=student.id, subject=subject, moy_cl=random.uniform(5, 20),
+                                                n_compo=random.uniform(5, 20), coef=random.randint(1, 4), period=PERIOD))
+        db.session.flush()
+        app_module.rebuild_grade_summaries()
+        db.session.commit()
+        return school_class.id, [student.id for student in students]
+
+def run_mode(args):
+    # Child process: the SQLite pragmas of a storage mode are installed on the engine, so each mode runs in its own process
+    sys.path.insert(0, REPO_ROOT)
+    import app as app_module
+    from sqlalchemy.exc import OperationalError
+    app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{args.db}', 'STORAGE_MODE': args.run_mode})
+    db = app_module.db
+
+    school_class_id, student_ids = seed(app_module, app, args.students)
+    deadline = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    counts = {'writes': 0, 'reads': 0, 'write_errors': 0, 'read_errors': 0}
+    write_latencies = []
+
+    def writer():
+        while time.perf_counter() < deadline:
+            student_id = random.choice(student_ids)
+            subject = random.choice(SUBJECTS)
+            moy_cl, n_compo, coef = random.uniform(5, 20), random.uniform(5, 20), random.randint(1, 4)
+            started = time.perf_counter()
+            with app.app_context():
+                try:
+                    db.session.add(app_module.Grade(student_id=student_id, subject=subject, moy_cl=moy_cl, n_compo=n_compo,
+                                                    coef=coef, period=PERIOD))
+                    app_module.apply_grade_to_summary(student_id, PERIOD, subject, moy_cl, n_compo, coef)
+                    db.session.commit()
+                    key = 'writes'
+                except OperationalError:
+                    db.session.rollback()
+                    key = 'write_errors'
+            with lock:
+                counts[key] += 1
+                if key == 'writes':
+                    write_latencies.append(time.perf_counter() - started)
+
+    def reader():
+        while time.perf_counter() < deadline:
+            with app.app_context():
+                try:
+                    app_module.get_class_rankings(school_class_id, PERIOD)
+                    app_module.query_grades_page(school_class_id, PERIOD)
+                    db.session.commit()
+                    key = 'reads'
+                except OperationalError:
+                    db.session.rollback()
+                    key = 'read_errors'
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    write_latencies.sort()
+    print(json.dumps({
+        'mode': args.run_mode,
+        **counts,
+        'writes_per_s': counts['writes'] / args.seconds,
+        'reads_per_s': counts['reads'] / args.seconds,
+        'write_p95_ms': write_latencies[int(len(write_latencies) * 0.95)] * 1000 if write_latencies else None,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--modes', nargs='+', default=['default', 'concurrent'])
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_mode:
+        return run_mode(args)
+
+    results = []
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            command = [sys.executable, os.path.abspath(__file__), '--run-mode', mode, '--db', os.path.join(temp_dir, 'bench.db'),
+                       '--writers', str(args.writers), '--readers', str(args.readers),
+                       '--seconds', str(args.seconds), '--students', str(args.students)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g} s per mode")
+    print(f"{'mode':<12} {'writes/s':>9} {'reads/s':>9} {'write p95':>10} {'write errors':>13} {'read errors':>12}")
+    for result in results:
+        p95 = f"{result['write_p95_ms']:.1f} ms" if result['write_p95_ms'] is not None else '-'
+        print(f"{result['mode']:<12} {result['writes_per_s']:>9.1f} {result['reads_per_s']:>9.1f} {p95:>10} "
+              f"{result['write_errors']:>13} {result['read_errors']:>12}")
+
+if __name__ == '__main__':
+    main()
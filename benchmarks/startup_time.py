@@ -0,0 +1,96 @@
+"""Startup time of the application: what a new worker process (or a test process) pays before serving.
+
+Each run starts a fresh Python process that measures:
+  import        `import app`
+  create_app    building the application (create_app(), or nothing for trees where importing app builds it)
+  first_request the first request, GET /login
+  process       the whole process, from its launch to its exit
+and reports whether ReportLab had been imported by then (the bulletin PDF code is only needed by the PDF routes).
+
+With --baseline REF, the same measurements are made on an export of that git revision, for comparison.
+
+    python benchmarks/startup_time.py [--runs 10] [--baseline HEAD~1] [--output FILE]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ('import', 'create_app', 'first_request', 'process')
+
+# Run in the child process, from the root of the tree being measured
+CHILD_SCRIPT = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+response = application.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_request': (served - created) * 1000,
+    'reportlab_loaded': 'reportlab' in sys.modules,
+}))
+'''
+
+def run_once(tree, db_path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+    env.pop('FLASK_APP', None)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], cwd=tree, env=env, check=True, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process'] = elapsed
+    return result
+
+def measure(tree, runs):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'startup.db')
+        run_once(tree, db_path) # Warm-up: bytecode compilation and the OS file cache
+        samples = [run_once(tree, db_path) for _ in range(runs)]
+    return {
+        **{phase: statistics.median(sample[phase] for sample in samples) for phase in PHASES},
+        'reportlab_loaded': any(sample['reportlab_loaded'] for sample in samples),
+    }
+
+def export_revision(ref, destination):
+    archive = subprocess.run(['git', 'archive', ref], cwd=REPO_ROOT, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', destination], input=archive, check=True)
+
+def print_results(results):
+    names = list(results)
+    print(f"{'median':<16}" + ''.join(f'{name:>14}' for name in names))
+    for phase in PHASES:
+        print(f'{phase:<16}' + ''.join(f"{results[name][phase]:>11.1f} ms" for name in names))
+    print(f"{'reportlab':<16}" + ''.join(f"{'loaded' if results[name]['reportlab_loaded'] else 'not loaded':>14}" for name in names))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='processes started per tree')
+    parser.add_argument('--baseline', metavar='REF', help='git revision to compare with')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as baseline_tree:
+            export_revision(args.baseline, baseline_tree)
+            results[args.baseline] = measure(baseline_tree, args.runs)
+    results['current'] = measure(REPO_ROOT, args.runs)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
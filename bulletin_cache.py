@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Content-addressed on-disk cache of rendered bulletin PDFs.
+# Files are stored as <cache_dir>/<student_id>/<sha256 of the bulletin data>.pdf so that an unchanged
+# bulletin is never rendered twice, and all the entries of a student can be dropped when their grades change.
+# Each student also has a generation token (<cache_dir>/<student_id>.generation), replaced on every invalidation:
+# callers read it before gathering the bulletin data and pass it to put, which drops a PDF rendered from data
+# read before an invalidation. The token lives on disk so that it is shared by all the worker processes.
+# The total size of the cache is bounded: least recently used files (by mtime, refreshed on every hit) are evicted first.
+# A running total of the cached bytes decides when to evict, so that a put does not walk the whole cache. It only
+# counts this process's changes: the cache is also rescanned every RESCAN_SECONDS to include the other workers'.
+class BulletinCache:
+    # Keys of summary_data that do not change the content of the bulletin.
+    # The issue date is excluded so that a bulletin keeps the date it was first rendered on.
+    IGNORED_SUMMARY_KEYS = ('date_generated',)
+    RESCAN_SECONDS = 300
+    # Eviction goes below the limit, so that the next puts do not immediately need another one
+    EVICT_TO_FRACTION = 0.9
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None # Unknown until the first scan
+        self._scanned_at = 0.0
+
+    def make_key(self, student_data, grades_part1, grades_part2, summary_data):
+        summary_for_key = {k: v for k, v in summary_data.items() if k not in self.IGNORED_SUMMARY_KEYS}
+        payload = json.dumps([student_data, grades_part1, grades_part2, summary_for_key], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _student_dir(self, student_id):
+        return os.path.join(self.cache_dir, str(student_id))
+
+    def _path_for(self, student_id, key):
+        return os.path.join(self._student_dir(student_id), f'{key}.pdf')
+
+    def _generation_path(self, student_id):
+        return os.path.join(self.cache_dir, f'{student_id}.generation')
+
+    # Current generation token of a student ('' until their entries are first invalidated)
+    def generation(self, student_id):
+        try:
+            with open(self._generation_path(student_id)) as generation_file:
+                return generation_file.read()
+        except FileNotFoundError:
+            return ''
+
+    # Returns the path of the cached PDF, or None on a cache miss
+    def get(self, student_id, key):
+        path = self._path_for(student_id, key)
+        try:
+            os.utime(path) # Mark as recently used for LRU eviction
+        except OSError:
+            return None
+        return path
+
+    # Store rendered PDF bytes in the cache and return their path. generation is the student's token read before
+    # the bulletin data was gathered: if their entries were invalidated since (by another thread or worker
+    # process), the PDF may be stale and None is returned without caching it.
+    def put(self, student_id, key, pdf_bytes, generation):
+        student_dir = self._student_dir(student_id)
+        try:
+            os.makedirs(student_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.pdf.tmp', dir=student_dir)
+        except FileNotFoundError: # The directory was removed by invalidate_student
+            return None
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(pdf_bytes)
+            if self.generation(student_id) != generation:
+                os.remove(temp_path)
+                return None
+            # invalidate_student replaces the token before removing the directory, so an invalidation from
+            # here on removes the temporary file, or the PDF once it is renamed
+            path = self._path_for(student_id, key)
+            replaced_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path) # Atomic, concurrent readers never see a partial file
+        except FileNotFoundError: # The directory was removed, with the temporary file in it
+            return None
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(pdf_bytes) - replaced_size
+            needs_scan = (self._total_bytes is None or self._total_bytes > self.max_bytes
+                          or time.monotonic() - self._scanned_at > self.RESCAN_SECONDS)
+        if needs_scan:
+            self.evict()
+        return path
+
+    # Drop every cached bulletin of a student (called when their grades change)
+    def invalidate_student(self, student_id):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.generation.tmp', dir=self.cache_dir)
+        with os.fdopen(fd, 'w') as temp_file:
+            temp_file.write(uuid.uuid4().hex)
+        os.replace(temp_path, self._generation_path(student_id))
+        student_dir = self._student_dir(student_id)
+        try:
+            removed_size = sum(entry.stat().st_size for entry in os.scandir(student_dir) if entry.name.endswith('.pdf'))
+        except OSError:
+            removed_size = 0
+        shutil.rmtree(student_dir, ignore_errors=True)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes = max(self._total_bytes - removed_size, 0)
+
+    # Measure the cache and, when it exceeds max_bytes, remove least recently used files until it fits in
+    # EVICT_TO_FRACTION of it
+    def evict(self):
+        with self._lock:
+            entries = []
+            total_size = 0
+            for root, _dirs, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.pdf'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total_size += stat.st_size
+
+            self._scanned_at = time.monotonic()
+            self._total_bytes = total_size
+            if total_size <= self.max_bytes:
+                return
+            entries.sort()
+            for _mtime, size, path in entries:
+                try:
+                    os.remove(path)
+                except OSError: # Already removed, or still open for sending on some platforms
+                    continue
+                total_size -= size
+                if total_size <= self.max_bytes * self.EVICT_TO_FRACTION:
+                    break
+            self._total_bytes = total_size
@@ -0,0 +1,131 @@
+from collections import namedtuple
+import numpy as np
+
+from grading import PASS_MARK, subject_average
+
+# Vectorized statistics of a class for one period (class councils, "Moy. du 1er").
+# The grades are loaded as dense student × subject arrays, then every aggregate and rank is computed
+# with NumPy over whole arrays, with the formulas of grading.py used by the bulletins.
+
+STATISTICS_PERCENTILES = (25, 50, 75)
+
+# Dense arrays of a class-period. Missing grades are NaN in moy_cl/n_compo/moy_generale and 0 in coef.
+# If a student has several grades for the same subject, the cell holds the first one (like the bulletin),
+# while student averages use every grade (like GradeSummary).
+GradeArrays = namedtuple('GradeArrays', [
+    'student_ids', 'subjects', 'moy_cl', 'n_compo', 'coef', 'moy_generale',
+    'student_total_coef', 'student_total_moy_coef'
+])
+
+# rows: iterable of (student_id, subject, moy_cl, n_compo, coef), in a stable order (e.g. by grade id)
+def build_grade_arrays(rows):
+    rows = list(rows)
+    student_ids = sorted({row[0] for row in rows})
+    subjects = sorted({row[1] for row in rows})
+    student_index = {student_id: i for i, student_id in enumerate(student_ids)}
+    subject_index = {subject: j for j, subject in enumerate(subjects)}
+    shape = (len(student_ids), len(subjects))
+
+    rows_student = np.fromiter((student_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+    rows_subject = np.fromiter((subject_index[row[1]] for row in rows), dtype=np.intp, count=len(rows))
+    values = np.array([row[2:5] for row in rows], dtype=float).reshape(len(rows), 3)
+    rows_moy_cl, rows_n_compo, rows_coef = values.T
+    rows_moy_generale = subject_average(rows_moy_cl, rows_n_compo)
+
+    moy_cl = np.full(shape, np.nan)
+    n_compo = np.full(shape, np.nan)
+    coef = np.zeros(shape)
+    _cells, first_rows = np.unique(rows_student * len(subjects) + rows_subject, return_index=True)
+    cell = (rows_student[first_rows], rows_subject[first_rows])
+    moy_cl[cell] = rows_moy_cl[first_rows]
+    n_compo[cell] = rows_n_compo[first_rows]
+    coef[cell] = rows_coef[first_rows]
+
+    return GradeArrays(
+        student_ids=student_ids,
+        subjects=subjects,
+        moy_cl=moy_cl,
+        n_compo=n_compo,
+        coef=coef,
+        moy_generale=subject_average(moy_cl, n_compo),
+        student_total_coef=np.bincount(rows_student, weights=rows_coef, minlength=len(student_ids)),
+        student_total_moy_coef=np.bincount(rows_student, weights=rows_moy_generale * rows_coef, minlength=len(student_ids))
+    )
+
+# Competition ranks ("1, 2, 2, 4") of each value along axis 0, highest first; NaN values get no rank (0)
+def competition_ranks(values):
+    values = np.asarray(values, dtype=float)
+    higher_counts = (values[np.newaxis, ...] > values[:, np.newaxis, ...]).sum(axis=1)
+    return np.where(np.isnan(values), 0, higher_counts + 1).astype(int)
+
+# Share of the (non-NaN) values of each column below each value, counting ties as half, in %
+def percentile_ranks(values):
+    values = np.asarray(values, dtype=float)
+    counts = (~np.isnan(values)).sum(axis=0)
+    below = (values[np.newaxis, ...] < values[:, np.newaxis, ...]).sum(axis=1)
+    equal = (values[np.newaxis, ...] == values[:, np.newaxis, ...]).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranks = 100.0 * (below + 0.5 * equal) / counts
+    return np.where(np.isnan(values), np.nan, ranks)
+
+def _describe(values, axis, pass_mark):
+    # mean/min/max/std/pass rate/percentiles of the non-NaN values along an axis
+    count = (~np.isnan(values)).sum(axis=axis)
+    percentiles = np.nanpercentile(values, STATISTICS_PERCENTILES, axis=axis)
+    return {
+        'count': count,
+        'mean': np.nanmean(values, axis=axis),
+        'min': np.nanmin(values, axis=axis),
+        'max': np.nanmax(values, axis=axis),
+        'std': np.nanstd(values, axis=axis),
+        'pass_rate': 100.0 * (values >= pass_mark).sum(axis=axis) / count,
+        **{f'p{q}': percentiles[i] for i, q in enumerate(STATISTICS_PERCENTILES)}
+    }
+
+def _json_number(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+# Statistics of a class-period from its grade rows (see build_grade_arrays), as a JSON-serializable dict:
+# per-subject aggregates and ranks, per-student averages/ranks/percentiles, and class-wide aggregates.
+def compute_class_statistics(rows, pass_mark=PASS_MARK):
+    arrays = build_grade_arrays(rows)
+    if not arrays.student_ids:
+        return {'student_count': 0, 'subjects': [], 'students': [], 'class': None}
+
+    subject_stats = _describe(arrays.moy_generale, 0, pass_mark)
+    subject_ranks = competition_ranks(arrays.moy_generale)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(arrays.student_total_coef > 0, arrays.student_total_moy_coef / arrays.student_total_coef, np.nan)
+    ranks = competition_ranks(averages)
+    tied_counts = (averages[np.newaxis, :] == averages[:, np.newaxis]).sum(axis=1)
+    percentiles = percentile_ranks(averages)
+    class_stats = _describe(averages, 0, pass_mark)
+
+    subjects = [
+        {'subject': subject, **{key: (int(values[j]) if key == 'count' else _json_number(values[j])) for key, values in subject_stats.items()}}
+        for j, subject in enumerate(arrays.subjects)
+    ]
+    students = [
+        {
+            'student_id': student_id,
+            'average': _json_number(averages[i]),
+            'rank': int(ranks[i]),
+            'tied': bool(tied_counts[i] > 1),
+            'percentile': _json_number(percentiles[i]),
+            'subject_ranks': {subject: int(subject_ranks[i, j]) for j, subject in enumerate(arrays.subjects) if subject_ranks[i, j]}
+        }
+        for i, student_id in enumerate(arrays.student_ids)
+    ]
+    students.sort(key=lambda student: (student['rank'] or len(students) + 1, student['student_id']))
+
+    return {
+        'student_count': len(arrays.student_ids),
+        'subjects': subjects,
+        'students': students,
+        'class': {
+            **{key: (int(value) if key == 'count' else _json_number(value)) for key, value in class_stats.items()},
+            'top_average': _json_number(class_stats['max']) # "Moy. du 1er"
+        }
+    }
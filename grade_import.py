@@ -0,0 +1,85 @@
+import csv
+import io
+
+# Reading of grade spreadsheets for the bulk import (/import_grades).
+# A spreadsheet has one row per student and subject, with the columns below (header names are
+# case-insensitive, extra columns are ignored). CSV files may use ',' or ';' as separator and
+# decimal commas ("12,5"), as exported by French versions of Excel/LibreOffice.
+REQUIRED_COLUMNS = ('student', 'subject', 'moy_cl', 'n_compo', 'coef')
+COLUMN_ALIASES = {
+    'username': 'student',
+    'eleve': 'student',
+    'élève': 'student',
+    'matiere': 'subject',
+    'matière': 'subject',
+    'moy cl': 'moy_cl',
+    'moy.cl': 'moy_cl',
+    'n compo': 'n_compo',
+    'n.compo': 'n_compo',
+    'coefficient': 'coef',
+}
+
+class GradeImportError(ValueError):
+    pass
+
+def _normalize_header(name):
+    name = str(name or '').strip().lower()
+    return COLUMN_ALIASES.get(name, name)
+
+def _rows_to_dicts(rows):
+    rows = iter(rows)
+    try:
+        header = [_normalize_header(h) for h in next(rows)]
+    except StopIteration:
+        raise GradeImportError('The file is empty.')
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise GradeImportError(f"Missing column(s): {', '.join(missing)}. Expected: {', '.join(REQUIRED_COLUMNS)}.")
+
+    records = []
+    for row_number, row in enumerate(rows, start=2): # Row 1 is the header
+        values = ['' if v is None else str(v).strip() for v in row]
+        if not any(values): # Skip blank lines
+            continue
+        values += [''] * (len(header) - len(values))
+        records.append({'row': row_number, **{c: values[header.index(c)] for c in REQUIRED_COLUMNS}})
+    return records
+
+def _read_csv(data):
+    text = data.decode('utf-8-sig')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return _rows_to_dicts(csv.reader(io.StringIO(text), dialect))
+
+def _read_xlsx(data):
+    try:
+        from openpyxl import load_workbook # Optional dependency, only needed for .xlsx files
+    except ImportError:
+        raise GradeImportError('Importing .xlsx files requires the openpyxl package. Please upload a CSV file instead.')
+    try:
+        workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception:
+        raise GradeImportError('The .xlsx file could not be read.')
+    try:
+        return _rows_to_dicts(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+# Returns the rows of an uploaded grade file as dicts (row, student, subject, moy_cl, n_compo, coef),
+# all values as stripped strings. Raises GradeImportError if the file can't be read.
+def read_grade_rows(filename, data):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        try:
+            return _read_csv(data)
+        except UnicodeDecodeError:
+            raise GradeImportError('CSV files must be encoded in UTF-8.')
+    if extension == 'xlsx':
+        return _read_xlsx(data)
+    raise GradeImportError('Unsupported file type. Please upload a .csv or .xlsx file.')
+
+# Parse a number written with a decimal point or a decimal comma
+def parse_grade_number(value):
+    return float(str(value).replace(',', '.'))
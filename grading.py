@@ -0,0 +1,100 @@
+from collections import deque
+
+# Grading rules shared by the app (grade summaries, rankings, bulletins) and the PDF bulletin.
+# The general mark of a subject is MG = (m + 2n) / 3, where m is the class average (Moy.CL) and n the
+# composition mark (N.Compo). Averages are weighted by the subject's coefficient k: Σ(MG·k) / Σk.
+
+# Marks at or above this average pass ("Passable" and better)
+PASS_MARK = 10
+
+APPRECIATION_THRESHOLDS = (
+    (16, "Très Bien"),
+    (14, "Bien"),
+    (12, "Assez Bien"),
+    (PASS_MARK, "Passable"),
+    (8, "Insuffisant"),
+)
+
+# Default bulletin layout (as per the example image), used when a class has no bulletin structure
+DEFAULT_SUBJECTS_PART1 = ['MATHS', 'PHYSIQUE', 'CHIMIE', 'GÉOLOGIE/BIO', 'PHILOSOPHIE', 'ANGLAIS']
+DEFAULT_SUBJECTS_PART2 = ['E.C.M', 'EPS', 'INFORMAT.', 'DESSIN TECH.', 'CONDUITE'] # And any others
+
+# Works on numbers, NumPy arrays (see class_stats.py) and SQL column expressions alike
+def subject_average(moy_cl, n_compo):
+    return (moy_cl + 2 * n_compo) / 3.0
+
+def weighted_average(total_moy_coef, total_coef):
+    return (total_moy_coef / total_coef) if total_coef > 0 else 0.0
+
+# Appreciation of an average out of 20
+def get_appreciation_for_average(avg):
+    for threshold, appreciation in APPRECIATION_THRESHOLDS:
+        if avg >= threshold:
+            return appreciation
+    return "Faible"
+
+# Appreciation of a subject from its two marks
+def get_subject_appreciation(moy_cl, n_compo):
+    if moy_cl is None or n_compo is None: # Handle cases where grades might be missing
+        return "N/A"
+    return get_appreciation_for_average(subject_average(moy_cl, n_compo))
+
+# A bulletin row: the grade's fields plus its general mark and weighted mark, computed once here so that
+# the totals and the PDF use the same values. Subjects with a zero coefficient (placeholders) count as 0.
+def make_bulletin_row(subject, moy_cl, n_compo, coef, appreciation):
+    moy_cl = float(moy_cl)
+    n_compo = float(n_compo)
+    coef = int(coef)
+    moy_generale = subject_average(moy_cl, n_compo) if coef > 0 else 0.0
+    return {
+        'subject': subject,
+        'moy_cl': moy_cl,
+        'n_compo': n_compo,
+        'coef': coef,
+        'appreciation': appreciation,
+        'moy_generale': moy_generale,
+        'moy_coef': moy_generale * coef
+    }
+
+def _placeholder_row(subject, appreciation='N/A'):
+    return make_bulletin_row(subject, 0, 0, 0, appreciation)
+
+# Split bulletin rows into the two parts of the bulletin, in the order of the class's structure.
+# rows are (subject key, row) pairs and the parts (subject key, subject name) pairs; the key identifies a
+# subject (the app uses the id of its Subject). Each subject of the structure takes the first remaining row
+# with its key (or a placeholder if the student has none), rows of other subjects go at the end of part 2.
+# Rows are indexed by key once, so this is linear in the number of grades and subjects.
+def split_grades_for_bulletin(rows, subjects_part1, subjects_part2):
+    rows_by_subject = {}
+    for index, (key, _row) in enumerate(rows):
+        rows_by_subject.setdefault(key, deque()).append(index)
+    used_indexes = set()
+
+    def take(key, subject):
+        indexes = rows_by_subject.get(key)
+        if not indexes:
+            return _placeholder_row(subject)
+        index = indexes.popleft()
+        used_indexes.add(index)
+        return rows[index][1]
+
+    grades_part1 = [take(key, subject) for key, subject in subjects_part1]
+    grades_part2 = [take(key, subject) for key, subject in subjects_part2]
+    grades_part2.extend(row for index, (_key, row) in enumerate(rows) if index not in used_indexes)
+
+    if not grades_part1: # Ensure it's not empty for the PDF generator
+        grades_part1 = [_placeholder_row('N/A', '-')]
+    return grades_part1, grades_part2
+
+# Subtotals, averages and appreciations of both parts and of the whole bulletin
+def compute_bulletin_totals(grades_part1, grades_part2):
+    totals = {}
+    for key, rows in (('p1', grades_part1), ('p2', grades_part2)):
+        totals[f'total_coef_{key}'] = sum(row['coef'] for row in rows)
+        totals[f'total_moy_coef_{key}'] = sum(row['moy_coef'] for row in rows)
+    totals['total_coef_globale'] = totals['total_coef_p1'] + totals['total_coef_p2']
+    totals['total_moy_coef_globale'] = totals['total_moy_coef_p1'] + totals['total_moy_coef_p2']
+    for key in ('p1', 'p2', 'globale'):
+        totals[f'moy_{key}'] = weighted_average(totals[f'total_moy_coef_{key}'], totals[f'total_coef_{key}'])
+        totals[f'appr_{key}'] = get_appreciation_for_average(totals[f'moy_{key}'])
+    return totals
@@ -0,0 +1,46 @@
+import os
+
+from serving import cpu_count
+
+# gunicorn settings, read automatically from the current directory: gunicorn wsgi:app
+# Every value can be overridden by an environment variable (below) or on the command line.
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# Rendering bulletins is CPU-bound and holds the GIL, so only processes run it in parallel: one worker per
+# CPU. The threads of each worker overlap the requests that wait on SQLite or the network.
+# Each worker has its own process-level caches; they follow the changes made through the other workers
+# via the cache_generation table (see sync_process_caches in app.py).
+workers = int(os.environ.get('WEB_CONCURRENCY', cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app and ReportLab, and load the fonts, once in the master (see wsgi.py): workers start faster
+# and share those pages with the master instead of each loading its own copy
+preload_app = True
+
+# Restart a worker after this many requests (plus a random part, so that workers do not all restart at
+# once), which caps the memory a long-running worker can accumulate
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 100))
+
+# A class PDF of a large class takes seconds: allow long requests before a worker is considered stuck
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+# On shutdown or restart, workers finish their current requests for up to this many seconds
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+
+def post_fork(server, worker):
+    # The engine was created in the master by preload_app: the worker opens its own connections, without
+    # closing the master's (SQLAlchemy's recommended way of sharing an engine across a fork)
+    from app import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Let the bulletin jobs already submitted to this worker finish (within graceful_timeout)
+    from wsgi import app
+    app.extensions['bulletin_job_executor'].shutdown(wait=True)
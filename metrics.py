@@ -0,0 +1,156 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# In-process request metrics, exposed in the Prometheus text format on /metrics (see install_metrics):
+# per-endpoint latency, SQL statements issued per request and their time (from SQLAlchemy engine events),
+# and PDF render durations. Values are kept per process: with several worker processes, each one is
+# scraped (or aggregated) separately.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # Seconds
+STATEMENT_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# SQL statements executed outside of a request (background bulletin jobs, CLI commands) are counted under this endpoint
+BACKGROUND_ENDPOINT = 'background'
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {} # labels -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets + ('+Inf',), series):
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, [("le", bound)])} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(series[-1])}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {series[len(self.buckets)]}')
+        return lines
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time to handle a request.', ['endpoint', 'method'])
+REQUESTS = Counter('http_requests_total', 'Handled requests.', ['endpoint', 'method', 'status'])
+REQUEST_SQL_STATEMENTS = Histogram('http_request_sql_statements', 'SQL statements issued by a request.', ['endpoint'],
+                                   buckets=STATEMENT_COUNT_BUCKETS)
+REQUESTS_OVER_QUERY_BUDGET = Counter('http_requests_over_query_budget_total', 'Requests that issued more SQL statements than SQL_QUERY_BUDGET.', ['endpoint'])
+SQL_STATEMENTS = Counter('sql_statements_total', 'Executed SQL statements.', ['endpoint'])
+SQL_DURATION = Counter('sql_statement_duration_seconds_total', 'Time spent executing SQL statements.', ['endpoint'])
+PDF_RENDER_DURATION = Histogram('pdf_render_duration_seconds', 'Time to render a PDF.', ['kind'])
+
+ALL_METRICS = (REQUEST_DURATION, REQUESTS, REQUEST_SQL_STATEMENTS, REQUESTS_OVER_QUERY_BUDGET, SQL_STATEMENTS, SQL_DURATION, PDF_RENDER_DURATION)
+
+def render_metrics():
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Time a PDF render: with pdf_render_timer('bulletin'): generate_bulletin_pdf(...)
+@contextmanager
+def pdf_render_timer(kind):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PDF_RENDER_DURATION.observe(time.perf_counter() - started, kind=kind)
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return BACKGROUND_ENDPOINT
+
+def _install_sql_events(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_statement_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        started_stack = conn.info.get('metrics_statement_started')
+        if not started_stack: # The timer was started before the listeners were installed
+            return
+        elapsed = time.perf_counter() - started_stack.pop()
+        endpoint = _current_endpoint()
+        SQL_STATEMENTS.inc(endpoint=endpoint)
+        SQL_DURATION.inc(elapsed, endpoint=endpoint)
+        if has_request_context():
+            g.metrics_sql_statements = g.get('metrics_sql_statements', 0) + 1
+
+# Record the metrics of every request and SQL statement of the app, and serve them on /metrics.
+# When the app's SQL_QUERY_BUDGET config value is set, requests issuing more statements are logged as warnings.
+def install_metrics(app, engine):
+    _install_sql_events(engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_request_started = time.perf_counter()
+        g.metrics_sql_statements = 0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('metrics_request_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        statements = g.get('metrics_sql_statements', 0)
+        REQUEST_SQL_STATEMENTS.observe(statements, endpoint=endpoint)
+
+        budget = app.config.get('SQL_QUERY_BUDGET')
+        if budget and statements > budget:
+            REQUESTS_OVER_QUERY_BUDGET.inc(endpoint=endpoint)
+            app.logger.warning(f"{request.method} {request.full_path.rstrip('?')} ({endpoint}) issued {statements} SQL statements, "
+                               f"over the query budget of {budget}")
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
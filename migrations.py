@@ -0,0 +1,113 @@
+# Versioned schema migrations for the SQLite database.
+#
+# db.create_all() only creates missing tables, it never changes an existing one, so every change to
+# the schema of an existing database (new index, new column, backfill...) is written here as a
+# numbered migration. The version of a database is stored in SQLite's PRAGMA user_version and each
+# migration runs once, in order. Migrations must be idempotent (IF NOT EXISTS, column checks...)
+# because a fresh database already gets the latest tables and indexes from db.create_all().
+
+from datetime import datetime
+
+from grading import DEFAULT_SUBJECTS_PART1
+
+MIGRATIONS = [] # (version, description, function(connection))
+
+def migration(version, description):
+    def register(migrate):
+        MIGRATIONS.append((version, description, migrate))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return migrate
+    return register
+
+def _column_names(connection, table):
+    return {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info("{table}")')}
+
+def get_schema_version(connection):
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+@migration(1, 'Indexes for the hot query paths (grades per student/period and by date, students per class/role)')
+def add_hot_path_indexes(connection):
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_grade_student_period ON grade (student_id, period)')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_grade_date_id ON grade (date, id)')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_user_class_role ON user (current_class_id, role)')
+
+@migration(2, 'Normalized bulletin subjects: grade.subject_id, backfilled from the comma-separated structures')
+def add_grade_subject_ids(connection):
+    # The subject table itself is created by db.create_all()
+    if 'subject_id' not in _column_names(connection, 'grade'):
+        connection.exec_driver_sql('ALTER TABLE grade ADD COLUMN subject_id INTEGER REFERENCES subject (id)')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_grade_subject_id ON grade (subject_id)')
+
+    structures = connection.exec_driver_sql('SELECT id, subjects_part1, subjects_part2 FROM bulletin_structure').all()
+    for structure_id, subjects_part1, subjects_part2 in structures:
+        if connection.exec_driver_sql('SELECT 1 FROM subject WHERE bulletin_structure_id = ?', (structure_id,)).first():
+            continue
+        seen_names = set()
+        for part, subjects_text in ((1, subjects_part1), (2, subjects_part2)):
+            position = 0
+            for name in (s.strip() for s in (subjects_text or '').split(',')):
+                if not name or name in seen_names:
+                    continue
+                seen_names.add(name)
+                connection.exec_driver_sql('INSERT INTO subject (bulletin_structure_id, name, part, position) VALUES (?, ?, ?, ?)',
+                                           (structure_id, name, part, position))
+                position += 1
+
+    connection.exec_driver_sql('''
+        UPDATE grade SET subject_id = (
+            SELECT subject.id FROM subject
+            JOIN bulletin_structure ON bulletin_structure.id = subject.bulletin_structure_id
+            JOIN user ON user.current_class_id = bulletin_structure.school_class_id
+            WHERE user.id = grade.student_id AND subject.name = grade.subject)
+        WHERE subject_id IS NULL''')
+
+@migration(3, 'Fill the grade_summary table for the grades entered before it existed')
+def fill_grade_summaries(connection):
+    # Same totals as rebuild_grade_summaries in app.py, computed in one statement. Summaries are derived data,
+    # so they are rebuilt from scratch. Part 1 grades are those linked to a part 1 subject by migration 2, or
+    # for a student whose class has no structure, those of the part 1 subjects of the default layout.
+    default_part1 = ', '.join('?' * len(DEFAULT_SUBJECTS_PART1))
+    connection.exec_driver_sql('DELETE FROM grade_summary')
+    connection.exec_driver_sql(f'''
+        INSERT INTO grade_summary (student_id, period, grade_count, total_coef, total_moy_coef,
+                                   part1_coef, part1_moy_coef, part2_coef, part2_moy_coef, average, updated_at)
+        SELECT student_id, period, COUNT(*), SUM(coef), SUM(moy_coef),
+               SUM(CASE WHEN in_part1 THEN coef ELSE 0 END), SUM(CASE WHEN in_part1 THEN moy_coef ELSE 0.0 END),
+               SUM(CASE WHEN in_part1 THEN 0 ELSE coef END), SUM(CASE WHEN in_part1 THEN 0.0 ELSE moy_coef END),
+               CASE WHEN SUM(coef) > 0 THEN SUM(moy_coef) / SUM(coef) END, ?
+        FROM (
+            SELECT grade.id, grade.student_id, grade.period, grade.coef,
+                   (grade.moy_cl + 2 * grade.n_compo) / 3.0 * grade.coef AS moy_coef,
+                   CASE WHEN bulletin_structure.id IS NULL THEN grade.subject IN ({default_part1})
+                        ELSE COALESCE(subject.part = 1, 0) END AS in_part1
+            FROM grade
+            JOIN user ON user.id = grade.student_id AND user.role = 'student'
+            LEFT JOIN bulletin_structure ON bulletin_structure.school_class_id = user.current_class_id
+            LEFT JOIN subject ON subject.id = grade.subject_id
+            ORDER BY grade.id
+        )
+        GROUP BY student_id, period''', (datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f'), *DEFAULT_SUBJECTS_PART1))
+
+# Create missing tables, then apply pending migrations. Returns the list of applied (version, description).
+def upgrade_database(db):
+    db.create_all()
+    applied = []
+    with db.engine.begin() as connection:
+        current_version = get_schema_version(connection)
+        for version, description, migrate in MIGRATIONS:
+            if version <= current_version:
+                continue
+            migrate(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {int(version)}')
+            applied.append((version, description))
+    return applied
+
+# EXPLAIN QUERY PLAN of an ORM query or Core select, as a list of plan lines
+def explain_query_plan(db, query):
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = compiled.construct_params()
+    positional_params = tuple(params[name] for name in compiled.positiontup) if compiled.positiontup else params
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', positional_params).all()
+    return [row[-1] for row in rows]
@@ -1,278 +1,473 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4  # Changed to A4 for more space, can be letter if preferred
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.lib.units import cm # Using cm for easier layout from image
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFFormXObject, PDFStream, PDFZCompress
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfgen.canvas import Canvas
+from reportlab import rl_config
+import itertools
 import os # For checking stamp path if used
+import threading
 
-def generate_bulletin_pdf(output_path, student_data, grades_part1, grades_part2, summary_data):
-    doc = SimpleDocTemplate(output_path, pagesize=A4,
-                            leftMargin=1.5*cm, rightMargin=1.5*cm,
-                            topMargin=1*cm, bottomMargin=1*cm)
-    styles = getSampleStyleSheet()
+# Fonts of the bulletins. The standard PDF fonts are not embedded at all, but they only cover the WinAnsi
+# character set (French accents such as É or Ï included). Paragraphs with other characters (e.g. the Ɛ, Ɔ,
+# Ɲ or Ŋ of Bambara names, drawn as black boxes by the standard fonts) use a TrueType family instead, of
+# which ReportLab embeds a subset: only the glyphs of those paragraphs.
+STANDARD_FONT = 'Helvetica'
+UNICODE_FONTS = ('BulletinSans', 'BulletinSans-Bold') # Regular and bold
+# Regular and bold TrueType files of the Unicode family: BULLETIN_FONT and BULLETIN_BOLD_FONT, or DejaVu Sans
+UNICODE_FONT_DIRS = ['/usr/share/fonts/truetype/dejavu', '/usr/share/fonts/truetype', '/usr/share/fonts/TTF',
+                     '/usr/share/fonts/dejavu', '/usr/local/share/fonts', '/Library/Fonts']
+
+_unicode_fonts_lock = threading.Lock()
+_unicode_fonts_available = None
+
+def _find_font_file(env_name, file_name):
+    path = os.environ.get(env_name)
+    if path:
+        return path
+    for directory in UNICODE_FONT_DIRS:
+        candidate = os.path.join(directory, file_name)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+# Registers the Unicode family on first use. Returns False when its files cannot be found.
+def _register_unicode_fonts():
+    global _unicode_fonts_available
+    with _unicode_fonts_lock:
+        if _unicode_fonts_available is None:
+            regular_path = _find_font_file('BULLETIN_FONT', 'DejaVuSans.ttf')
+            bold_path = _find_font_file('BULLETIN_BOLD_FONT', 'DejaVuSans-Bold.ttf')
+            _unicode_fonts_available = bool(regular_path and bold_path)
+            if _unicode_fonts_available:
+                regular, bold = UNICODE_FONTS
+                pdfmetrics.registerFont(TTFont(regular, regular_path))
+                pdfmetrics.registerFont(TTFont(bold, bold_path))
+                # <b> in paragraphs switches to the bold font of the family
+                for is_bold, is_italic, font_name in ((0, 0, regular), (1, 0, bold), (0, 1, regular), (1, 1, bold)):
+                    addMapping(regular, is_bold, is_italic, font_name)
+        return _unicode_fonts_available
+
+# Font of a paragraph: the standard font whenever its text fits in its character set
+def font_for_text(text):
+    try:
+        text.encode('cp1252') # The WinAnsi encoding of the standard fonts
+        return STANDARD_FONT
+    except UnicodeEncodeError:
+        return UNICODE_FONTS[0] if _register_unicode_fonts() else STANDARD_FONT
+
+# Canvas of the compact output mode. ReportLab compresses page streams by default but then encodes them in
+# ASCII85, a quarter larger, through a process-wide setting (rl_config.useA85); this canvas gives its own
+# pages and forms plain Flate streams instead, without changing that setting for the other renders.
+class CompactCanvas(Canvas):
+    def __init__(self, *args, **kwargs):
+        kwargs['pageCompression'] = 1
+        super().__init__(*args, **kwargs)
+
+    def save(self):
+        if len(self._code):
+            self.showPage()
+        stream_objects = list(self._doc.Pages.pages)
+        stream_objects += [obj for obj in self._doc.idToObject.values() if isinstance(obj, PDFFormXObject)]
+        for obj in stream_objects:
+            if obj.Contents is None and obj.stream:
+                obj.Contents = PDFStream(content=obj.stream, filters=[PDFZCompress])
+                obj.compression = 0 # Or ReportLab replaces the filters when writing the document
+        super().save()
+
+_form_ids = itertools.count(1)
+
+# Flowables that a document draws once, into a PDF form XObject, and then places by reference wherever they
+# appear again: the header of a class PDF is stored once instead of on every page. The flowables are laid
+# out one under the other as the page frame would, so the result looks the same as drawing them directly.
+class SharedForm(Flowable):
+    def __init__(self, flowables):
+        super().__init__()
+        self.flowables = flowables
+        self.form_name = f'SharedForm{next(_form_ids)}'
+
+    def wrap(self, avail_width, avail_height):
+        self._layout = []
+        y = 0
+        for i, flowable in enumerate(self.flowables):
+            flowable.canv = getattr(self, 'canv', None)
+            width, height = flowable.wrap(avail_width, avail_height)
+            if i: # Space between two flowables, see Frame._add
+                space_before = flowable.getSpaceBefore()
+                if rl_config.overlapAttachedSpace:
+                    space_before = max(space_before - self.flowables[i - 1].getSpaceAfter(), 0)
+                y += space_before
+            self._layout.append((flowable, width, y + height))
+            y += height
+            if i < len(self.flowables) - 1:
+                y += flowable.getSpaceAfter()
+        self.width, self.height = avail_width, y
+        return self.width, self.height
+
+    def getSpaceAfter(self):
+        return self.flowables[-1].getSpaceAfter() if self.flowables else 0
+
+    def draw(self):
+        canv = self.canv
+        if not canv.hasForm(self.form_name):
+            canv.beginForm(self.form_name, 0, 0, self.width, self.height)
+            for flowable, width, bottom in self._layout:
+                flowable.drawOn(canv, 0, self.height - bottom, _sW=self.width - width)
+            canv.endForm()
+        canv.doForm(self.form_name)
+
+def _create_doc_template(output_path):
+    return SimpleDocTemplate(output_path, pagesize=A4,
+                             leftMargin=1.5*cm, rightMargin=1.5*cm,
+                             topMargin=1*cm, bottomMargin=1*cm)
+
+# output_path is either a file path or a writable binary file-like object (e.g. io.BytesIO),
+# which lets callers render a bulletin entirely in memory.
+# compact=True writes a smaller file that looks the same, with binary compressed streams (see CompactCanvas).
+def generate_bulletin_pdf(output_path, student_data, grades_part1, grades_part2, summary_data, compact=False):
+    doc = _create_doc_template(output_path)
+    doc.build(build_bulletin_elements(student_data, grades_part1, grades_part2, summary_data),
+              canvasmaker=CompactCanvas if compact else Canvas)
+
+def generate_class_bulletins_pdf(output_path, bulletins, compact=False):
+    # bulletins: iterable of (student_data, grades_part1, grades_part2, summary_data) tuples,
+    # rendered one after the other into a single multi-page document (one bulletin per page).
+    # Like generate_bulletin_pdf, output_path can be a path or a binary file-like object. In compact mode,
+    # the header that every page repeats is also stored once, as a form (see SharedForm).
+    doc = _create_doc_template(output_path)
     elements = []
+    for student_data, grades_part1, grades_part2, summary_data in bulletins:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(build_bulletin_elements(student_data, grades_part1, grades_part2, summary_data, header_form=compact))
+    if not elements: # SimpleDocTemplate cannot build an empty story
+        elements.append(Spacer(1, 0))
+    doc.build(elements, canvasmaker=CompactCanvas if compact else Canvas)
 
-    # Helper function to create styled paragraphs
-    def create_paragraph(text, style_name, alignment=TA_LEFT, space_after=0, space_before=0, font_size=None, leading=None, text_color=colors.black):
-        style = ParagraphStyle(name=f'Custom{style_name}-{text[:10]}', parent=styles[style_name]) # Unique name
-        style.alignment = alignment
-        style.spaceAfter = space_after * cm
-        style.spaceBefore = space_before * cm
-        style.textColor = text_color
-        if font_size:
-            style.fontSize = font_size
-        if leading:
-            style.leading = leading
-        return Paragraph(text, style)
-
-    # School Header
-    elements.append(create_paragraph("Ministère de l'Education Nationale", 'Normal', alignment=TA_LEFT, font_size=10))
-    elements.append(create_paragraph("***************************", 'Normal', alignment=TA_LEFT, font_size=8, space_after=0.1))
-    elements.append(create_paragraph("Académie d'Enseignement de Ségou", 'Normal', alignment=TA_LEFT, font_size=10))
-    elements.append(create_paragraph("***************************", 'Normal', alignment=TA_LEFT, font_size=8, space_after=0.2))
-    
-    header_table_data = [
-        [create_paragraph(f"<b>Lycée {student_data.get('school_name', 'Michel ALLAIRE')} de Ségou</b> BP : {student_data.get('school_bp', '580')} TEL: {student_data.get('school_tel', '21-32-11-20')}", 'Normal', font_size=10),
-         create_paragraph("République du Mali", 'Normal', alignment=TA_RIGHT, font_size=10)],
-        [create_paragraph(f"E-mail: {student_data.get('school_email', 'michelallaire2007@yahoo.fr')} / {student_data.get('school_tel_alt', '79 07 03 60')}", 'Normal', font_size=10),
-         create_paragraph("Un Peuple-Un But-Une Foi", 'Normal', alignment=TA_RIGHT, font_size=9)],
-        ['', create_paragraph("***************************", 'Normal', alignment=TA_RIGHT, font_size=8)]
-    ]
-    header_table = Table(header_table_data, colWidths=[12*cm, 6*cm])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 0),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 0), # Added to minimize spacing
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 0.3*cm))
-
-    # Student and Class Info
-    student_name_str = student_data.get('student_name', 'NOM PRENOM DE L\'ELEVE').upper()
-    student_info_line1 = f"<b>{student_data.get('academic_period', '2ème Période 2022-2023')}</b>"
-    student_info_line2 = f"<b>{student_name_str}</b>"
-    student_info_line3 = f"<b>{student_data.get('class_name', '12ème TSE')}</b>"
-
-    # Table for Student Info layout
-    # Row 1: academic_period (left), student_name (center), class_name (right)
-    info_layout_table_data = [
-        [create_paragraph(student_info_line1, 'Normal', alignment=TA_LEFT, font_size=11),
-         create_paragraph(student_info_line2, 'Normal', alignment=TA_CENTER, font_size=16), # Larger font for name
-         create_paragraph(student_info_line3, 'Normal', alignment=TA_RIGHT, font_size=11)]
-    ]
-    info_layout_table = Table(info_layout_table_data, colWidths=[6*cm, 6*cm, 6*cm])
-    info_layout_table.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 0),
-    ]))
-    elements.append(info_layout_table)
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # Grades Table Header & Function
-    col_widths_grades = [4.6*cm, 1.2*cm, 1.7*cm, 1.7*cm, 1.2*cm, 2.4*cm, 2.2*cm] # Adjusted widths
-    
-    def create_grades_table(grades_list): # Removed title argument
-        header_texts = ['Matières', 'Moy,CL\nm', 'N, Compo\nn', 'M,G,\n(m+2n)/3', 'Coef,\nk', 'Moy Coef\n(m+2n)/3*k', 'Appr,']
-        header_paragraphs = [create_paragraph(text, 'Normal', alignment=TA_CENTER, font_size=8, leading=9) for text in header_texts]
-        table_data = [header_paragraphs]
-        
-        total_coef_part = 0
-        total_moy_coef_part = 0.0
+def build_bulletin_elements(student_data, grades_part1, grades_part2, summary_data, header_form=False):
+    return get_bulletin_template().build_elements(student_data, grades_part1, grades_part2, summary_data, header_form)
 
-        for grade_item in grades_list:
-            m = float(grade_item.get('moy_cl', 0))
-            n = float(grade_item.get('n_compo', 0))
-            k = int(grade_item.get('coef', 0))
-            
-            mg = (m + 2*n) / 3.0 if k > 0 else 0.0
-            moy_coef = mg * k
-            
-            total_coef_part += k
-            total_moy_coef_part += moy_coef
-            
-            table_data.append([
-                create_paragraph(str(grade_item.get('subject', '')), 'Normal', font_size=8, alignment=TA_LEFT),
-                create_paragraph(f'{m:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER),
-                create_paragraph(f'{n:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER),
-                create_paragraph(f'{mg:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER),
-                create_paragraph(str(k), 'Normal', font_size=8, alignment=TA_CENTER),
-                create_paragraph(f'{moy_coef:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER),
-                create_paragraph(str(grade_item.get('appreciation', '')), 'Normal', font_size=8, alignment=TA_CENTER),
-            ])
-        
-        table = Table(table_data, colWidths=col_widths_grades, rowHeights=[1*cm] + [0.6*cm]*len(grades_list)) # Header height + row height
-        style = TableStyle([
+_bulletin_templates = threading.local()
+
+# BulletinTemplate of the current thread, built on first use (or ahead of time by calling this at startup).
+# Flowables keep drawing state (the canvas, their wrapped size) while a page is rendered, so the shared
+# flowables of a template must never be drawn by two threads at once: each rendering thread has its own.
+def get_bulletin_template():
+    template = getattr(_bulletin_templates, 'template', None)
+    if template is None:
+        template = _bulletin_templates.template = BulletinTemplate()
+    return template
+
+class BulletinTemplate:
+    # Everything in a bulletin that does not depend on the student: fonts, paragraph styles,
+    # table styles and the static header/label/signature flowables. It is built once per thread (see
+    # get_bulletin_template), each render then only creates the per-student rows.
+
+    # Grades Table Header
+    COL_WIDTHS_GRADES = [4.6*cm, 1.2*cm, 1.7*cm, 1.7*cm, 1.2*cm, 2.4*cm, 2.2*cm] # Adjusted widths
+    GRADES_HEADER_TEXTS = ['Matières', 'Moy,CL\nm', 'N, Compo\nn', 'M,G,\n(m+2n)/3', 'Coef,\nk', 'Moy Coef\n(m+2n)/3*k', 'Appr,']
+    # Keys of student_data used by the (cached) school header
+    SCHOOL_KEYS = ('school_name', 'school_bp', 'school_tel', 'school_email', 'school_tel_alt')
+
+    FONT_NAMES = ('Helvetica', 'Helvetica-Bold')
+
+    def __init__(self):
+        for font_name in self.FONT_NAMES: # Load font metrics now rather than during the first render
+            pdfmetrics.getFont(font_name)
+        self.styles = getSampleStyleSheet()
+        self._paragraph_styles = {}
+        self._school_headers = {}
+        self._header_forms = {}
+        self._cells = {}
+
+        self.layout_table_style = TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 0), # Added to minimize spacing
+        ])
+        self.info_table_style = TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+        ])
+        self.grades_table_style = TableStyle([
             ('GRID', (0,0), (-1,-1), 0.5, colors.black),
             ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
             ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'), 
             ('LEFTPADDING', (0,1), (0,-1), 3), # Padding for subject content
             ('RIGHTPADDING', (0,1), (0,-1), 3),
         ])
-        table.setStyle(style)
-        elements.append(table)
-        return total_coef_part, total_moy_coef_part
-
-    # Part 1 Grades
-    total_coef_p1, total_moy_coef_p1 = create_grades_table(grades_part1)
-    
-    # Part 1 Summary
-    moy_partielle_p1 = (total_moy_coef_p1 / total_coef_p1) if total_coef_p1 > 0 else 0.0
-    summary_p1_data = [
-        [create_paragraph('<b>Total Partiel</b>', 'Normal', font_size=8, alignment=TA_LEFT), '', '', '', 
-         create_paragraph(str(total_coef_p1), 'Normal', font_size=8, alignment=TA_CENTER), 
-         create_paragraph(f'{total_moy_coef_p1:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER), 
-         ''],
-        [create_paragraph('<b>Moy.Partielle</b>', 'Normal', font_size=8, alignment=TA_LEFT), '', '', '', '', 
-         create_paragraph(f'{moy_partielle_p1:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER), 
-         create_paragraph(str(summary_data.get('appr_p1','')), 'Normal', font_size=8, alignment=TA_CENTER)]
-    ]
-    summary_p1_table = Table(summary_p1_data, colWidths=col_widths_grades, rowHeights=[0.6*cm, 0.6*cm])
-    summary_p1_table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('SPAN', (0,0), (3,0)), 
-        ('SPAN', (0,1), (4,1)), 
-        ('LEFTPADDING', (0,0), (0,-1), 3),
-    ]))
-    elements.append(summary_p1_table)
-    elements.append(Spacer(1, 0.3*cm))
-
-    # Part 2 Grades
-    total_coef_p2, total_moy_coef_p2 = create_grades_table(grades_part2)
-
-    # Part 2 Summary
-    moy_partielle_p2 = (total_moy_coef_p2 / total_coef_p2) if total_coef_p2 > 0 else 0.0
-    summary_p2_data = [
-        [create_paragraph('<b>Total Partiel</b>', 'Normal', font_size=8, alignment=TA_LEFT), '', '', '', 
-         create_paragraph(str(total_coef_p2), 'Normal', font_size=8, alignment=TA_CENTER), 
-         create_paragraph(f'{total_moy_coef_p2:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER),
-         ''],
-        [create_paragraph('<b>Moy.Partielle</b>', 'Normal', font_size=8, alignment=TA_LEFT), '', '', '', '', 
-         create_paragraph(f'{moy_partielle_p2:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER), 
-         create_paragraph(str(summary_data.get('appr_p2','')), 'Normal', font_size=8, alignment=TA_CENTER)]
-    ]
-    summary_p2_table = Table(summary_p2_data, colWidths=col_widths_grades, rowHeights=[0.6*cm, 0.6*cm])
-    summary_p2_table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('SPAN', (0,0), (3,0)), 
-        ('SPAN', (0,1), (4,1)),
-        ('LEFTPADDING', (0,0), (0,-1), 3),
-    ]))
-    elements.append(summary_p2_table)
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # Global Summary
-    total_global_coef = total_coef_p1 + total_coef_p2
-    total_global_moy_coef = total_moy_coef_p1 + total_moy_coef_p2
-    moy_globale = (total_global_moy_coef / total_global_coef) if total_global_coef > 0 else 0.0
-    
-    total_global_row_data = [
-        [create_paragraph('<b>Total Global</b>', 'Normal',font_size=9, alignment=TA_LEFT), '', '', '', 
-         create_paragraph(str(total_global_coef), 'Normal', font_size=9, alignment=TA_CENTER), 
-         create_paragraph(f'{total_global_moy_coef:.2f}'.replace('.',','), 'Normal', font_size=9, alignment=TA_CENTER), 
-         create_paragraph(str(summary_data.get('appr_globale','')), 'Normal', font_size=9, alignment=TA_CENTER)]
-    ]
-    total_global_table_aligned = Table(total_global_row_data, colWidths=col_widths_grades, rowHeights=[0.7*cm])
-    total_global_table_aligned.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('SPAN', (0,0), (3,0)), 
-        ('LEFTPADDING', (0,0), (0,-1), 3),
-    ]))
-    elements.append(total_global_table_aligned)
-    elements.append(Spacer(1, 0.5*cm)) # Increased space
-
-    # Footer information: Rank, Date, Averages (using a single table for better alignment)
-    # This part needs careful data from summary_data
-    rang_text = f"Rang: {summary_data.get('rank', '1er')}"
-    date_text = f"Ségou, le {summary_data.get('date_generated', '07/06/2023')}"
-    moy_globale_text = f"Moy: {moy_globale:.2f} /20".replace('.',',')
-    moy_premier_text = f"Moy, du 1er: {summary_data.get('rank_1_moy', '16,23/20')}"
-
-    footer_line1_table_data = [
-        [create_paragraph(rang_text, 'Normal', font_size=9, alignment=TA_LEFT),
-         create_paragraph(date_text, 'Normal', font_size=9, alignment=TA_CENTER),
-         create_paragraph(moy_globale_text, 'Normal', font_size=9, alignment=TA_RIGHT),
-         create_paragraph(moy_premier_text, 'Normal', font_size=9, alignment=TA_RIGHT)]
-    ]
-    footer_line1_table = Table(footer_line1_table_data, colWidths=[4.5*cm, 5*cm, 4*cm, 4.5*cm]) # Adjusted
-    footer_line1_table.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 0),
-    ]))
-    elements.append(footer_line1_table)
-    elements.append(Spacer(1, 0.3*cm))
-
-    moy_p1_overall_text = summary_data.get('moy_p1_overall', '16,51 /20')
-    moy_p2_overall_text = summary_data.get('moy_p2_overall', '16,23 /20')
-    moy_annuelle_text = summary_data.get('moy_annuelle', '16,37 /20')
-
-    footer_data2 = [
-        [create_paragraph(f"<b>Moy.1ère Période</b><br/>{moy_p1_overall_text}", 'Normal', font_size=9, alignment=TA_CENTER, leading=11), 
-         create_paragraph(f"<b>Moy.2ème Période</b><br/>{moy_p2_overall_text}", 'Normal', font_size=9, alignment=TA_CENTER, leading=11), 
-         create_paragraph(f"<b>Moyenne Annuelle</b><br/>{moy_annuelle_text}", 'Normal', font_size=9, alignment=TA_CENTER, leading=11)]
-    ]
-    footer_table2 = Table(footer_data2, colWidths=[6*cm, 6*cm, 6*cm], rowHeights=[1.2*cm]) # Set row height
-    footer_table2.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-    ]))
-    elements.append(footer_table2)
-    elements.append(Spacer(1, 1*cm))
-
-    # Signatures and Stamp
-    # Using a table for "Le Proviseur", "Tableau dExcellence" and "Signature du Parent"
-    # This helps in positioning them correctly relative to each other and the stamp.
-
-    proviseur_text = "Le Proviseur"
-    tableau_excellence_text = "Tableau dExcellence"
-    signature_parent_text = "Signature du Parent"
-
-    # Attempt to place stamp - this is tricky with flowables. Absolute positioning might be better.
-    # For now, let's assume it's part of the left column content or placed manually after generation.
-    # If you have a stamp image:
-    stamp_content = ""
-    # try:
-    #     stamp_path = student_data.get('school_stamp_path', None) # e.g. 'static/stamp.png'
-    #     if stamp_path and os.path.exists(stamp_path):
-    #         stamp_img = Image(stamp_path, width=2.5*cm, height=2.5*cm) # Adjust size
-    #         stamp_content = stamp_img # This will place it as a flowable
-    #     else:
-    #         stamp_content = create_paragraph("(Sceau)", 'Normal', font_size=8, alignment=TA_CENTER)
-    # except Exception as e:
-    #     print(f"Error loading stamp: {e}")
-    #     stamp_content = create_paragraph("(Erreur Sceau)", 'Normal', font_size=8, alignment=TA_CENTER)
-
-
-    final_elements_data = [
-        [create_paragraph(proviseur_text, 'Normal', font_size=10, alignment=TA_LEFT), '', ''],
-        [stamp_content if stamp_content else create_paragraph("",'Normal'), '', ''], # Placeholder for stamp image or text
-        [create_paragraph(tableau_excellence_text, 'Normal', font_size=10, alignment=TA_LEFT, space_before=0.5), 
-         '', 
-         create_paragraph(signature_parent_text, 'Normal', font_size=10, alignment=TA_RIGHT, space_before=0.5)]
-    ]
+        self.partial_summary_table_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('SPAN', (0,0), (3,0)), 
+            ('SPAN', (0,1), (4,1)), 
+            ('LEFTPADDING', (0,0), (0,-1), 3),
+        ])
+        self.global_summary_table_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('SPAN', (0,0), (3,0)), 
+            ('LEFTPADDING', (0,0), (0,-1), 3),
+        ])
+        self.footer_line1_table_style = TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+        ])
+        self.footer_averages_table_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 1, colors.black),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+
+        # Static flowables, shared by every bulletin
+        self.ministry_header = [
+            self.paragraph("Ministère de l'Education Nationale", 'Normal', alignment=TA_LEFT, font_size=10),
+            self.paragraph("***************************", 'Normal', alignment=TA_LEFT, font_size=8, space_after=0.1),
+            self.paragraph("Académie d'Enseignement de Ségou", 'Normal', alignment=TA_LEFT, font_size=10),
+            self.paragraph("***************************", 'Normal', alignment=TA_LEFT, font_size=8, space_after=0.2),
+        ]
+        self.grades_header_row = [self.paragraph(text, 'Normal', alignment=TA_CENTER, font_size=8, leading=9) for text in self.GRADES_HEADER_TEXTS]
+        self.total_partiel_label = self.paragraph('<b>Total Partiel</b>', 'Normal', font_size=8, alignment=TA_LEFT)
+        self.moy_partielle_label = self.paragraph('<b>Moy.Partielle</b>', 'Normal', font_size=8, alignment=TA_LEFT)
+        self.total_global_label = self.paragraph('<b>Total Global</b>', 'Normal',font_size=9, alignment=TA_LEFT)
+        self.signature_table = self._build_signature_table()
+
+    # Paragraph styles are shared between all paragraphs with the same settings
+    def paragraph_style(self, style_name, alignment=TA_LEFT, space_after=0, space_before=0, font_size=None, leading=None, text_color=colors.black, font_name=STANDARD_FONT):
+        key = (style_name, alignment, space_after, space_before, font_size, leading, text_color.hexval(), font_name)
+        style = self._paragraph_styles.get(key)
+        if style is None:
+            style = ParagraphStyle(name=f'Custom{style_name}-{len(self._paragraph_styles)}', parent=self.styles[style_name])
+            style.fontName = font_name
+            style.alignment = alignment
+            style.spaceAfter = space_after * cm
+            style.spaceBefore = space_before * cm
+            style.textColor = text_color
+            if font_size:
+                style.fontSize = font_size
+            if leading:
+                style.leading = leading
+            self._paragraph_styles[key] = style
+        return style
+
+    # Helper function to create styled paragraphs
+    def paragraph(self, text, style_name, alignment=TA_LEFT, space_after=0, space_before=0, font_size=None, leading=None, text_color=colors.black):
+        return Paragraph(text, self.paragraph_style(style_name, alignment, space_after, space_before, font_size, leading, text_color, font_for_text(text)))
+
+    # Grade table cells (subjects, marks, coefficients, appreciations) take few distinct values across a
+    # class, so their paragraphs are parsed once and shared. The column is part of the key, so a shared
+    # paragraph is always wrapped to the same width.
+    MAX_CACHED_CELLS = 20000
+
+    def cell(self, text, column, font_size=8, alignment=TA_CENTER):
+        key = (text, column, font_size, alignment)
+        paragraph = self._cells.get(key)
+        if paragraph is None:
+            if len(self._cells) >= self.MAX_CACHED_CELLS:
+                self._cells.clear()
+            paragraph = self._cells[key] = self.paragraph(text, 'Normal', font_size=font_size, alignment=alignment)
+        return paragraph
+
+    # School Header (cached per school, it only depends on the school fields of student_data)
+    def school_header(self, student_data):
+        key = tuple(student_data.get(k) for k in self.SCHOOL_KEYS)
+        header_table = self._school_headers.get(key)
+        if header_table is None:
+            header_table_data = [
+                [self.paragraph(f"<b>Lycée {student_data.get('school_name', 'Michel ALLAIRE')} de Ségou</b> BP : {student_data.get('school_bp', '580')} TEL: {student_data.get('school_tel', '21-32-11-20')}", 'Normal', font_size=10),
+                 self.paragraph("République du Mali", 'Normal', alignment=TA_RIGHT, font_size=10)],
+                [self.paragraph(f"E-mail: {student_data.get('school_email', 'michelallaire2007@yahoo.fr')} / {student_data.get('school_tel_alt', '79 07 03 60')}", 'Normal', font_size=10),
+                 self.paragraph("Un Peuple-Un But-Une Foi", 'Normal', alignment=TA_RIGHT, font_size=9)],
+                ['', self.paragraph("***************************", 'Normal', alignment=TA_RIGHT, font_size=8)]
+            ]
+            header_table = Table(header_table_data, colWidths=[12*cm, 6*cm])
+            header_table.setStyle(self.layout_table_style)
+            self._school_headers[key] = header_table
+        return header_table
+
+    def _build_signature_table(self):
+        # Signatures and Stamp
+        # Using a table for "Le Proviseur", "Tableau dExcellence" and "Signature du Parent"
+        # This helps in positioning them correctly relative to each other and the stamp.
+
+        proviseur_text = "Le Proviseur"
+        tableau_excellence_text = "Tableau dExcellence"
+        signature_parent_text = "Signature du Parent"
+
+        # Attempt to place stamp - this is tricky with flowables. Absolute positioning might be better.
+        # For now, let's assume it's part of the left column content or placed manually after generation.
+        # If you have a stamp image:
+        stamp_content = ""
+        # try:
+        #     stamp_path = student_data.get('school_stamp_path', None) # e.g. 'static/stamp.png'
+        #     if stamp_path and os.path.exists(stamp_path):
+        #         stamp_img = Image(stamp_path, width=2.5*cm, height=2.5*cm) # Adjust size
+        #         stamp_content = stamp_img # This will place it as a flowable
+        #     else:
+        #         stamp_content = self.paragraph("(Sceau)", 'Normal', font_size=8, alignment=TA_CENTER)
+        # except Exception as e:
+        #     print(f"Error loading stamp: {e}")
+        #     stamp_content = self.paragraph("(Erreur Sceau)", 'Normal', font_size=8, alignment=TA_CENTER)
 
-    final_table = Table(final_elements_data, colWidths=[7*cm, 4*cm, 7*cm])
-    final_table.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 0),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-        # Span the stamp cell if it's just text, or adjust if it's an image
-        ('SPAN', (0,1), (0,1)), # Span for stamp placeholder
-    ]))
 
-    elements.append(final_table)
-    
-    doc.build(elements)
+        final_elements_data = [
+            [self.paragraph(proviseur_text, 'Normal', font_size=10, alignment=TA_LEFT), '', ''],
+            [stamp_content if stamp_content else self.paragraph("",'Normal'), '', ''], # Placeholder for stamp image or text
+            [self.paragraph(tableau_excellence_text, 'Normal', font_size=10, alignment=TA_LEFT, space_before=0.5), 
+             '', 
+             self.paragraph(signature_parent_text, 'Normal', font_size=10, alignment=TA_RIGHT, space_before=0.5)]
+        ]
+
+        final_table = Table(final_elements_data, colWidths=[7*cm, 4*cm, 7*cm])
+        final_table.setStyle(TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+            # Span the stamp cell if it's just text, or adjust if it's an image
+            ('SPAN', (0,1), (0,1)), # Span for stamp placeholder
+        ]))
+        return final_table
+
+    # Ministry and school headers as one form, drawn once per document (see SharedForm)
+    def header_form(self, student_data):
+        key = tuple(student_data.get(k) for k in self.SCHOOL_KEYS)
+        form = self._header_forms.get(key)
+        if form is None:
+            form = self._header_forms[key] = SharedForm(self.ministry_header + [self.school_header(student_data)])
+        return form
+
+    def build_elements(self, student_data, grades_part1, grades_part2, summary_data, header_form=False):
+        create_paragraph = self.paragraph
+        col_widths_grades = self.COL_WIDTHS_GRADES
+        elements = []
+
+        # School Header
+        if header_form:
+            elements.append(self.header_form(student_data))
+        else:
+            elements.extend(self.ministry_header)
+            elements.append(self.school_header(student_data))
+        elements.append(Spacer(1, 0.3*cm))
+
+        # Student and Class Info
+        student_name_str = student_data.get('student_name', 'NOM PRENOM DE L\'ELEVE').upper()
+        student_info_line1 = f"<b>{student_data.get('academic_period', '2ème Période 2022-2023')}</b>"
+        student_info_line2 = f"<b>{student_name_str}</b>"
+        student_info_line3 = f"<b>{student_data.get('class_name', '12ème TSE')}</b>"
+
+        # Table for Student Info layout
+        # Row 1: academic_period (left), student_name (center), class_name (right)
+        info_layout_table_data = [
+            [create_paragraph(student_info_line1, 'Normal', alignment=TA_LEFT, font_size=11),
+             create_paragraph(student_info_line2, 'Normal', alignment=TA_CENTER, font_size=16), # Larger font for name
+             create_paragraph(student_info_line3, 'Normal', alignment=TA_RIGHT, font_size=11)]
+        ]
+        info_layout_table = Table(info_layout_table_data, colWidths=[6*cm, 6*cm, 6*cm])
+        info_layout_table.setStyle(self.info_table_style)
+        elements.append(info_layout_table)
+        elements.append(Spacer(1, 0.5*cm))
+
+        # Rows and totals come precomputed from grading.py (make_bulletin_row / compute_bulletin_totals),
+        # this only lays them out
+        def create_grades_table(grades_list): # Removed title argument
+            table_data = [self.grades_header_row]
+            for grade_item in grades_list:
+                table_data.append([
+                    self.cell(str(grade_item.get('subject', '')), 0, alignment=TA_LEFT),
+                    self.cell(f"{grade_item['moy_cl']:.2f}".replace('.',','), 1),
+                    self.cell(f"{grade_item['n_compo']:.2f}".replace('.',','), 2),
+                    self.cell(f"{grade_item['moy_generale']:.2f}".replace('.',','), 3),
+                    self.cell(str(grade_item['coef']), 4),
+                    self.cell(f"{grade_item['moy_coef']:.2f}".replace('.',','), 5),
+                    self.cell(str(grade_item.get('appreciation', '')), 6),
+                ])
+            
+            table = Table(table_data, colWidths=col_widths_grades, rowHeights=[1*cm] + [0.6*cm]*len(grades_list)) # Header height + row height
+            table.setStyle(self.grades_table_style)
+            elements.append(table)
+
+        def create_partial_summary_table(total_coef_part, total_moy_coef_part, moy_partielle, appreciation):
+            summary_table_data = [
+                [self.total_partiel_label, '', '', '', 
+                 create_paragraph(str(total_coef_part), 'Normal', font_size=8, alignment=TA_CENTER), 
+                 create_paragraph(f'{total_moy_coef_part:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER), 
+                 ''],
+                [self.moy_partielle_label, '', '', '', '', 
+                 create_paragraph(f'{moy_partielle:.2f}'.replace('.',','), 'Normal', font_size=8, alignment=TA_CENTER), 
+                 create_paragraph(str(appreciation), 'Normal', font_size=8, alignment=TA_CENTER)]
+            ]
+            summary_table = Table(summary_table_data, colWidths=col_widths_grades, rowHeights=[0.6*cm, 0.6*cm])
+            summary_table.setStyle(self.partial_summary_table_style)
+            elements.append(summary_table)
+            elements.append(Spacer(1, 0.3*cm))
+
+        # Part 1 Grades and Summary
+        create_grades_table(grades_part1)
+        create_partial_summary_table(summary_data['total_coef_p1'], summary_data['total_moy_coef_p1'], summary_data['moy_p1'], summary_data.get('appr_p1',''))
+
+        # Part 2 Grades and Summary
+        create_grades_table(grades_part2)
+        create_partial_summary_table(summary_data['total_coef_p2'], summary_data['total_moy_coef_p2'], summary_data['moy_p2'], summary_data.get('appr_p2',''))
+        
+        # Global Summary
+        total_global_coef = summary_data['total_coef_globale']
+        total_global_moy_coef = summary_data['total_moy_coef_globale']
+        moy_globale = summary_data['moy_globale']
+        
+        total_global_row_data = [
+            [self.total_global_label, '', '', '', 
+             create_paragraph(str(total_global_coef), 'Normal', font_size=9, alignment=TA_CENTER), 
+             create_paragraph(f'{total_global_moy_coef:.2f}'.replace('.',','), 'Normal', font_size=9, alignment=TA_CENTER), 
+             create_paragraph(str(summary_data.get('appr_globale','')), 'Normal', font_size=9, alignment=TA_CENTER)]
+        ]
+        total_global_table_aligned = Table(total_global_row_data, colWidths=col_widths_grades, rowHeights=[0.7*cm])
+        total_global_table_aligned.setStyle(self.global_summary_table_style)
+        elements.append(total_global_table_aligned)
+        elements.append(Spacer(1, 0.5*cm)) # Increased space
+
+        # Footer information: Rank, Date, Averages (using a single table for better alignment)
+        # This part needs careful data from summary_data
+        rang_text = f"Rang: {summary_data.get('rank', '1er')}"
+        date_text = f"Ségou, le {summary_data.get('date_generated', '07/06/2023')}"
+        moy_globale_text = f"Moy: {moy_globale:.2f} /20".replace('.',',')
+        moy_premier_text = f"Moy, du 1er: {summary_data.get('rank_1_moy', '16,23/20')}"
+
+        footer_line1_table_data = [
+            [create_paragraph(rang_text, 'Normal', font_size=9, alignment=TA_LEFT),
+             create_paragraph(date_text, 'Normal', font_size=9, alignment=TA_CENTER),
+             create_paragraph(moy_globale_text, 'Normal', font_size=9, alignment=TA_RIGHT),
+             create_paragraph(moy_premier_text, 'Normal', font_size=9, alignment=TA_RIGHT)]
+        ]
+        footer_line1_table = Table(footer_line1_table_data, colWidths=[4.5*cm, 5*cm, 4*cm, 4.5*cm]) # Adjusted
+        footer_line1_table.setStyle(self.footer_line1_table_style)
+        elements.append(footer_line1_table)
+        elements.append(Spacer(1, 0.3*cm))
+
+        # One cell per period of the year, then the annual average
+        footer_cells = [f"<b>Moy. {period}</b><br/>{average_text}" for period, average_text in summary_data.get('period_averages', [])]
+        footer_cells.append(f"<b>Moyenne Annuelle</b><br/>{summary_data.get('moy_annuelle', '-')}")
+        footer_data2 = [[create_paragraph(text, 'Normal', font_size=9, alignment=TA_CENTER, leading=11) for text in footer_cells]]
+        footer_table2 = Table(footer_data2, colWidths=[18*cm / len(footer_cells)] * len(footer_cells), rowHeights=[1.2*cm]) # Set row height
+        footer_table2.setStyle(self.footer_averages_table_style)
+        elements.append(footer_table2)
+        elements.append(Spacer(1, 1*cm))
+
+        elements.append(self.signature_table)
+        
+        return elements
 
 # Example Usage (for testing purposes, adapt with real data from Flask app)
 if __name__ == '__main__':
+    from grading import make_bulletin_row, compute_bulletin_totals
     # Ensure student_name, class_name are provided in student_data for the header
     dummy_student_data = {
         'school_name': 'Lycée Démo Ségou',
@@ -300,15 +495,18 @@ if __name__ == '__main__':
         {'subject': 'DESSIN TECH.', 'moy_cl': 15, 'n_compo': 20, 'coef': 2, 'appreciation': 'Tbien'},
         {'subject': 'CONDUITE', 'moy_cl': 18, 'n_compo': 18, 'coef': 1, 'appreciation': 'Tbien'},
     ]
+    # Rows and totals are precomputed by grading.py, like the app does
+    dummy_grades_p1 = [make_bulletin_row(**g) for g in dummy_grades_p1]
+    dummy_grades_p2 = [make_bulletin_row(**g) for g in dummy_grades_p2]
     dummy_summary_data = {
+        **compute_bulletin_totals(dummy_grades_p1, dummy_grades_p2),
         'appr_p1': 'Tbien', 
         'appr_p2': 'Tbien', 
         'appr_globale':'Excellent', 
         'rank': '1er',
         'date_generated': '15/07/2024',
         'rank_1_moy': '18,50/20',
-        'moy_p1_overall': '17,50 /20',
-        'moy_p2_overall': '18,00 /20',
+        'period_averages': [('1ère Période', '17,50 /20'), ('2e Période', '18,00 /20'), ('3e Période', '-')],
         'moy_annuelle': '17,75 /20'
     }
 
@@ -0,0 +1,85 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+# Opt-in request profiler (see install_profiler). A profiled request runs under cProfile and its stats are
+# written to PROFILE_DIR as a pstats file named after the time, route, user and duration, e.g.
+#   20261017-101502-123456_generate_report_alice_412ms.prof
+# Read them with `flask profile-stats FILE`, `python -m pstats FILE`, or a viewer such as snakeviz.
+#
+#   PROFILE_SAMPLE_RATE  share of all requests to profile, from 0 to 1 (default 0)
+#   PROFILE_USERS        comma-separated usernames allowed to profile their own requests with ?profile=1
+#   PROFILE_DIR          where the profiles are written
+#
+# With no sampling and no profiling users, no hook is installed at all.
+
+PROFILE_QUERY_ARG = 'profile'
+
+# One profiled request at a time per process: since Python 3.12, cProfile can only be enabled once per process
+# ("Another profiling tool is already active"). A request that should be profiled while another one is just runs
+# unprofiled.
+_profiler_lock = threading.Lock()
+
+def _file_part(value):
+    return re.sub(r'[^A-Za-z0-9-]+', '_', str(value)).strip('_') or '-'
+
+def profiling_enabled(app):
+    return app.config.get('PROFILE_SAMPLE_RATE', 0) > 0 or bool(app.config.get('PROFILE_USERS'))
+
+def _should_profile(app, profile_users):
+    if request.args.get(PROFILE_QUERY_ARG) and profile_users:
+        if current_user.is_authenticated and current_user.username in profile_users:
+            return True
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0)
+    return sample_rate > 0 and random.random() < sample_rate
+
+def install_profiler(app):
+    if not profiling_enabled(app):
+        return
+    profile_users = {name.strip() for name in (app.config.get('PROFILE_USERS') or '').split(',') if name.strip()}
+    profile_dir = app.config['PROFILE_DIR']
+    os.makedirs(profile_dir, exist_ok=True)
+
+    @app.before_request
+    def start_profiler():
+        if not _should_profile(app, profile_users) or not _profiler_lock.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # Another profiler (e.g. a debugger or coverage tool) is active
+            _profiler_lock.release()
+            return
+        g.profiler = profiler
+        g.profiler_started = time.perf_counter()
+
+    @app.after_request
+    def write_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        _profiler_lock.release()
+        duration_ms = (time.perf_counter() - g.profiler_started) * 1000
+        username = current_user.username if current_user.is_authenticated else 'anonymous'
+        filename = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{_file_part(request.endpoint or 'unmatched')}_{_file_part(username)}_{duration_ms:.0f}ms.prof"
+        try:
+            profiler.dump_stats(os.path.join(profile_dir, filename))
+        except OSError as e:
+            app.logger.error(f"Could not write profile {filename}: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_profiler(_exception):
+        # The view raised before after_request could write the profile: just stop profiling this thread
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
@@ -0,0 +1,84 @@
+import re
+from datetime import datetime, timedelta
+
+from grading import get_subject_appreciation
+
+# Synthetic school data, to reproduce production volumes locally (`flask seed-school`) and for the benchmarks.
+# Rows are written with bulk executemany inserts on the tables (no ORM objects), so that tens of thousands
+# of grades take seconds. GradeSummary rows are not written here, rebuild them afterwards.
+
+SEED_SUBJECTS_PART1 = ['MATHS', 'PHYSIQUE', 'CHIMIE', 'SVT', 'PHILOSOPHIE', 'FRANCAIS', 'ANGLAIS']
+SEED_SUBJECTS_PART2 = ['HIST-GEO', 'E.C.M', 'EPS', 'INFORMATIQUE', 'LV2', 'CONDUITE']
+
+# Time between the grades of two consecutive periods
+PERIOD_LENGTH = timedelta(days=90)
+
+# Usernames of a class's accounts: "<slug>_000", "<slug>_001"... for students and "<slug>_teacher"
+def class_username_prefix(class_name):
+    return re.sub(r'\W+', '_', class_name.lower()).strip('_')
+
+def seed_subjects(subject_count):
+    subjects = SEED_SUBJECTS_PART1 + SEED_SUBJECTS_PART2
+    subjects += [f'OPTION {n}' for n in range(1, subject_count - len(subjects) + 1)]
+    subjects = subjects[:subject_count]
+    split = len(subjects) // 2 + 1
+    return subjects[:split], subjects[split:]
+
+def _clamp_mark(value):
+    return min(20.0, max(0.0, round(value, 2)))
+
+# classes: list of (class name, student count). Each class gets a bulletin structure with subject_count
+# subjects, a teacher, its students and one grade per subject and period; every student has a level and
+# their marks vary around it. Returns the ids of the created classes, the caller commits.
+def generate_school(db, classes, periods, subject_count, password_hash, rng, now=None):
+    tables = db.metadata.tables
+    school_class_table, structure_table, subject_table = tables['school_class'], tables['bulletin_structure'], tables['subject']
+    user_table, grade_table = tables['user'], tables['grade']
+    now = now or datetime.utcnow()
+    period_dates = {period: now - PERIOD_LENGTH * (len(periods) - 1 - i) for i, period in enumerate(periods)}
+    subjects_part1, subjects_part2 = seed_subjects(subject_count)
+
+    class_ids = []
+    for class_name, student_count in classes:
+        class_id = db.session.execute(school_class_table.insert().values(name=class_name)).inserted_primary_key[0]
+        structure_id = db.session.execute(structure_table.insert().values(
+            school_class_id=class_id, subjects_part1=','.join(subjects_part1), subjects_part2=','.join(subjects_part2)
+        )).inserted_primary_key[0]
+        db.session.execute(subject_table.insert(), [
+            {'bulletin_structure_id': structure_id, 'name': name, 'part': part, 'position': position}
+            for part, names in ((1, subjects_part1), (2, subjects_part2)) for position, name in enumerate(names)
+        ])
+        subject_ids = dict(db.session.execute(
+            subject_table.select().with_only_columns(subject_table.c.name, subject_table.c.id)
+            .where(subject_table.c.bulletin_structure_id == structure_id)
+        ).all())
+
+        prefix = class_username_prefix(class_name)
+        # Every row of an executemany needs the same keys, the teacher has no class
+        db.session.execute(user_table.insert(), [{'username': f'{prefix}_teacher', 'password': password_hash, 'role': 'teacher', 'current_class_id': None}] + [
+            {'username': f'{prefix}_{i:03d}', 'password': password_hash, 'role': 'student', 'current_class_id': class_id}
+            for i in range(student_count)
+        ])
+        student_ids = db.session.execute(
+            user_table.select().with_only_columns(user_table.c.id)
+            .where(user_table.c.current_class_id == class_id, user_table.c.role == 'student')
+        ).scalars().all()
+
+        grades = []
+        for student_id in student_ids:
+            level = rng.uniform(6, 17)
+            coefs = {subject: rng.randint(1, 5) for subject in subject_ids}
+            for period in periods:
+                for subject, subject_id in subject_ids.items():
+                    moy_cl = _clamp_mark(rng.gauss(level, 2.5))
+                    n_compo = _clamp_mark(rng.gauss(level, 3))
+                    grades.append({
+                        'student_id': student_id, 'subject': subject, 'subject_id': subject_id,
+                        'moy_cl': moy_cl, 'n_compo': n_compo, 'coef': coefs[subject],
+                        'appreciation': get_subject_appreciation(moy_cl, n_compo), 'period': period,
+                        'date': period_dates[period] - timedelta(minutes=rng.randrange(60 * 24 * 30))
+                    })
+        if grades:
+            db.session.execute(grade_table.insert(), grades)
+        class_ids.append(class_id)
+    return class_ids
@@ -0,0 +1,10 @@
+import os
+
+# Settings shared by the production entry points (wsgi.py, gunicorn.conf.py). Keep this module free of
+# app imports: gunicorn reads its config file before it loads the app.
+
+def cpu_count():
+    # CPUs this process may run on, which can be fewer than the machine's (containers, taskset)
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
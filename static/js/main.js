@@ -1,24 +1,21 @@
-// Initialize grade chart for student dashboard
-function initializeGradeChart(grades) {
-    const ctx = document.getElementById('gradeChart');
-    if (!ctx) return;
+// Grade chart of the student dashboard: the general mark (MG, out of 20) of each subject of a period,
+// as aggregated by /api/student_summary
+let gradeChart = null;
 
-    const subjects = [...new Set(grades.map(g => g.subject))];
-    const gradesBySubject = subjects.map(subject => {
-        const subjectGrades = grades.filter(g => g.subject === subject);
-        return {
-            subject,
-            average: subjectGrades.reduce((sum, g) => sum + g.grade, 0) / subjectGrades.length
-        };
-    });
+function initializeGradeChart(subjects) {
+    const ctx = document.getElementById('gradeChart');
+    if (!ctx || typeof Chart === 'undefined') return;
 
-    new Chart(ctx, {
+    if (gradeChart) {
+        gradeChart.destroy();
+    }
+    gradeChart = new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: gradesBySubject.map(g => g.subject),
+            labels: subjects.map(s => s.subject),
             datasets: [{
-                label: 'Average Grade',
-                data: gradesBySubject.map(g => g.average),
+                label: 'M.G. /20',
+                data: subjects.map(s => s.mg),
                 backgroundColor: 'rgba(54, 162, 235, 0.5)',
                 borderColor: 'rgba(54, 162, 235, 1)',
                 borderWidth: 1
@@ -29,7 +26,7 @@ function initializeGradeChart(grades) {
             scales: {
                 y: {
                     beginAtZero: true,
-                    max: 100
+                    max: 20
                 }
             }
         }
@@ -41,10 +38,16 @@ document.addEventListener('DOMContentLoaded', function() {
     const gradeForm = document.querySelector('form[action*="add_grade"]');
     if (gradeForm) {
         gradeForm.addEventListener('submit', function(e) {
-            const grade = parseFloat(document.getElementById('grade').value);
-            if (grade < 0 || grade > 100) {
+            // Same rules as validate_grade_values() on the server
+            const moyCl = parseFloat(document.getElementById('moy_cl').value);
+            const nCompo = parseFloat(document.getElementById('n_compo').value);
+            const coef = parseInt(document.getElementById('coef').value, 10);
+            if (!(moyCl >= 0 && moyCl <= 20 && nCompo >= 0 && nCompo <= 20)) {
                 e.preventDefault();
-                alert('Grade must be between 0 and 100');
+                alert('Grades must be between 0 and 20.');
+            } else if (!(coef > 0)) {
+                e.preventDefault();
+                alert('Coefficient must be a positive number.');
             }
         });
     }
@@ -54,54 +57,4 @@ document.addEventListener('DOMContentLoaded', function() {
     tooltipTriggerList.map(function (tooltipTriggerEl) {
         return new bootstrap.Tooltip(tooltipTriggerEl);
     });
-
-    // Handle grade deletion
-    document.querySelectorAll('.delete-grade').forEach(button => {
-        button.addEventListener('click', function() {
-            if (confirm('Are you sure you want to delete this grade?')) {
-                const gradeId = this.dataset.gradeId;
-                fetch(`/delete_grade/${gradeId}`, {
-                    method: 'DELETE',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    }
-                }).then(response => {
-                    if (response.ok) {
-                        window.location.reload();
-                    } else {
-                        alert('Error deleting grade');
-                    }
-                });
-            }
-        });
-    });
-
-    // Handle grade editing
-    document.querySelectorAll('.edit-grade').forEach(button => {
-        button.addEventListener('click', function() {
-            const gradeId = this.dataset.gradeId;
-            const row = this.closest('tr');
-            const subject = row.cells[1].textContent;
-            const grade = row.cells[2].textContent;
-            
-            const newGrade = prompt(`Enter new grade for ${subject}:`, grade);
-            if (newGrade !== null) {
-                fetch(`/update_grade/${gradeId}`, {
-                    method: 'PUT',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        grade: parseFloat(newGrade)
-                    })
-                }).then(response => {
-                    if (response.ok) {
-                        window.location.reload();
-                    } else {
-                        alert('Error updating grade');
-                    }
-                });
-            }
-        });
-    });
 });
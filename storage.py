@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# SQLite storage settings, selected with the STORAGE_MODE config value (environment variable of the same name):
+#   'default'    - SQLite's defaults: rollback journal, so a writer blocks every reader, and the 5 s busy timeout
+#                  of Python's sqlite3, after which requests fail with "database is locked".
+#   'concurrent' - WAL journaling (readers never block the writer and the writer never blocks readers), a longer
+#                  busy timeout so that concurrent writers queue instead of failing, tuned pragmas and a larger pool.
+# The journal mode is stored in the database file, so 'default' explicitly switches it back to a rollback journal.
+STORAGE_MODES = {
+    'default': {
+        'pragmas': {'journal_mode': 'DELETE'},
+        'engine_options': {},
+    },
+    'concurrent': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 15000, # ms
+            'synchronous': 'NORMAL', # Durable enough with WAL: only a power loss can drop the last commits, never corrupt
+            'cache_size': -32000, # Negative means KiB: 32 MB of page cache per connection
+            'temp_store': 'MEMORY',
+            'mmap_size': 128 * 1024 * 1024,
+        },
+        'engine_options': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'connect_args': {'timeout': 15}, # Seconds, the busy timeout of Python's sqlite3 module
+        },
+    },
+}
+DEFAULT_STORAGE_MODE = 'concurrent'
+
+def _is_sqlite_file(database_uri):
+    url = make_url(database_uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def get_storage_mode(app):
+    mode = app.config.get('STORAGE_MODE') or DEFAULT_STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown STORAGE_MODE {mode!r}, expected one of: {', '.join(STORAGE_MODES)}")
+    return mode
+
+# Set the engine options of the storage mode. Must be called before db.init_app(app) creates the engine;
+# options already present in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+def configure_storage(app):
+    mode = get_storage_mode(app)
+    if not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return # In-memory SQLite and other databases keep their own pool and settings
+    engine_options = dict(STORAGE_MODES[mode]['engine_options'])
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+# Apply the mode's pragmas to every new connection of the engine
+def install_storage_pragmas(engine, mode):
+    pragmas = STORAGE_MODES[mode]['pragmas']
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+# Current values of the pragmas that the storage modes set, for `flask storage-info`
+def read_storage_pragmas(connection):
+    names = STORAGE_MODES['concurrent']['pragmas']
+    return {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in names}
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+# What Flask-Login needs to know about the logged-in user, without a database session: the identity fields
+# of User plus the id and name of their current class. Routes use it like a User through current_user.
+class CachedUser(UserMixin):
+    __slots__ = ('id', 'username', 'role', 'current_class_id', 'current_class_name')
+
+    def __init__(self, id, username, role, current_class_id, current_class_name):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.current_class_id = current_class_id
+        self.current_class_name = current_class_name
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+# In-memory cache of CachedUser snapshots by user id, so that authenticated requests do not query the user.
+# Entries expire after ttl seconds, which bounds how long another process can serve a stale role or class;
+# in this process the app invalidates a user as soon as the row changes. At most max_size users are kept,
+# the least recently used are evicted first.
+class UserCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict() # user_id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+
+    # Returns the cached snapshot, or None if missing or expired
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user):
+        if self.max_size <= 0 or self.ttl <= 0: # Cache disabled
+            return user
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
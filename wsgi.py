@@ -0,0 +1,24 @@
+import os
+
+from app import create_app, preload_pdf_renderer
+from serving import cpu_count
+
+# Production entry point:
+#   gunicorn wsgi:app    Linux/macOS, settings in gunicorn.conf.py (read from the current directory)
+#   python wsgi.py       waitress, e.g. on Windows where gunicorn does not run
+# Create the database first with `flask init-db`.
+
+app = create_app()
+# With gunicorn's preload_app, this runs once in the master process and the forked workers inherit the
+# loaded ReportLab modules and fonts (each request thread still builds its own bulletin template)
+preload_pdf_renderer()
+
+if __name__ == '__main__':
+    # waitress serves from a single process: threads overlap database and network waits, but PDF
+    # rendering holds the GIL and uses one core at most. Prefer gunicorn where it is available.
+    from waitress import serve
+    serve(app,
+          host=os.environ.get('HOST', '0.0.0.0'),
+          port=int(os.environ.get('PORT', 8000)),
+          threads=int(os.environ.get('WEB_THREADS', max(4, 2 * cpu_count()))),
+          channel_timeout=int(os.environ.get('WEB_TIMEOUT', 120)))